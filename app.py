@@ -1,9 +1,57 @@
 import streamlit as st
 import pandas as pd
-from langchain.chat_models import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage
-import json
 import os
+import io
+import json
+import time
+import uuid
+
+from clusterapp import (
+    AVAILABLE_MODELS,
+    BULK_COLUMNS,
+    BULK_MAX_CONCURRENCY,
+    BUNDLE_MIME,
+    DIFFICULTY_LEVELS,
+    DRILLDOWN_KEYWORD_COUNT,
+    EXPORT_FORMATS,
+    GROUP_SIMILARITY_THRESHOLD,
+    KEYWORD_COUNT,
+    LLM_HEDGE_ENABLED,
+    LLM_HEDGE_MAX_RATIO,
+    LLM_HEDGE_PERCENTILE,
+    LLM_JSON_MODE,
+    LLM_MAX_CONNECTIONS,
+    LLM_TIMEOUT_SECONDS,
+    MODEL_NAME,
+    MODEL_TEMPERATURE,
+    NEAR_DUPLICATE_THRESHOLD,
+    TRACE_LOG_PATH,
+    ClusterGenerationError,
+    LLMSettings,
+    ResultStore,
+    TopicTree,
+    add_metric_columns,
+    bundle_bytes,
+    enable_trace_log,
+    export_bytes,
+    export_file_name,
+    fetch_content_clusters,
+    generate_all_difficulties,
+    generation_flights,
+    group_keywords,
+    hedger,
+    iter_results,
+    llm_registry,
+    metrics,
+    near_duplicate_report,
+    number_rows,
+    open_default_cache,
+    parse_bulk_jobs,
+    rate_limiters,
+    run_bulk_jobs,
+    span,
+    traced,
+)
 
 # Set the API key directly in the code
 API_KEY = st.secrets["key"]
@@ -17,169 +65,49 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS (unchanged from original)
-st.markdown("""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600;700&display=swap');
-    
-    html, body, [class*="css"] {
-        font-family: 'Poppins', sans-serif;
-    }
-    
-    .main {
-        padding-top: 1rem;
-        background-color: #F9FAFB;
-    }
-    
-    .stApp {
-        max-width: 1200px;
-        margin: 0 auto;
-    }
-    
-    h1 {
-        color: #4F46E5;
-        font-weight: 700;
-        margin-bottom: 1.5rem;
-    }
-    
-    h2, h3 {
-        color: #4338CA;
-        font-weight: 600;
-    }
-    
-    .stButton > button {
-        background-color: #4F46E5;
-        color: white;
-        border-radius: 8px;
-        padding: 0.6rem 1.2rem;
-        font-weight: 600;
-        border: none;
-        transition: all 0.3s ease;
-    }
-    
-    .stButton > button:hover {
-        background-color: #4338CA;
-        transform: translateY(-2px);
-        box-shadow: 0 4px 12px rgba(79, 70, 229, 0.2);
-    }
-    
-    .css-1v3fvcr {
-        background-color: #F9FAFB;
-    }
-    
-    .table-container {
-        background-color: white;
-        padding: 24px;
-        border-radius: 12px;
-        box-shadow: 0 4px 15px rgba(0,0,0,0.05);
-        margin-top: 1.5rem;
-        margin-bottom: 1.5rem;
-    }
-    
-    .download-btn {
-        background-color: #10B981;
-        color: white;
-        border-radius: 8px;
-        padding: 0.5rem 1rem;
-        font-weight: 600;
-        border: none;
-        display: inline-flex;
-        align-items: center;
-        gap: 8px;
-    }
-    
-    .download-btn:hover {
-        background-color: #059669;
-    }
-    
-    .sidebar .css-1d391kg {
-        background-color: #F3F4F6;
-    }
-    
-    .hero-section {
-        background: linear-gradient(135deg, #4F46E5 0%, #7C3AED 100%);
-        padding: 2rem;
-        border-radius: 12px;
-        color: white;
-        margin-bottom: 2rem;
-    }
-    
-    .hero-section h1 {
-        color: white;
-        margin-bottom: 1rem;
-    }
-    
-    .hero-section p {
-        opacity: 0.9;
-        font-size: 1.1rem;
-        margin-bottom: 0;
-    }
-    
-    .form-container {
-        background-color: white;
-        padding: 2rem;
-        border-radius: 12px;
-        box-shadow: 0 4px 15px rgba(0,0,0,0.05);
-    }
-    
-    .success-message {
-        background-color: #ECFDF5;
-        border-left: 5px solid #10B981;
-        padding: 1rem;
-        border-radius: 6px;
-        margin-bottom: 1.5rem;
-    }
-    
-    .stDataFrame {
-        border: none !important;
-    }
-    
-    .stDataFrame [data-testid="stDataFrameResizable"] {
-        border: none !important;
-    }
-    
-    footer {
-        text-align: center;
-        padding: 1.5rem 0;
-        color: #6B7280;
-    }
-    
-    /* Custom divider */
-    .custom-divider {
-        height: 4px;
-        background: linear-gradient(90deg, #4F46E5, #7C3AED);
-        border-radius: 2px;
-        margin: 0.5rem 0 1.5rem 0;
-        width: 100px;
-    }
-    
-    /* Difficulty badge styles */
-    .difficulty-badge {
-        padding: 4px 10px;
-        border-radius: 12px;
-        font-size: 0.85rem;
-        font-weight: 600;
-        display: inline-block;
-        margin-left: 10px;
-    }
-    .low-difficulty {
-        background-color: #D1FAE5;
-        color: #065F46;
-    }
-    .medium-difficulty {
-        background-color: #FEF3C7;
-        color: #92400E;
-    }
-    .high-difficulty {
-        background-color: #FEE2E2;
-        color: #991B1B;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-# Initialize session state for storing keywords across difficulty levels
-if 'all_generated_keywords' not in st.session_state:
-    st.session_state.all_generated_keywords = {}
+# Custom CSS, read once per process and injected on every rerun
+@st.cache_resource
+def load_css():
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "styles.css")) as css_file:
+        return f"<style>\n{css_file.read()}</style>"
+
+st.markdown(load_css(), unsafe_allow_html=True)
+
+# Option that generates every difficulty level at once
+ALL_DIFFICULTIES = "All difficulties"
+
+# Pagination of the history panels
+HISTORY_PAGE_SIZE = 50
+HISTORY_TOPICS_PER_PAGE = 5
+
+# One cache instance shared by every session in this process
+@st.cache_resource
+def get_keyword_cache():
+    return open_default_cache()
+
+# One bounded result store shared by every session in this process
+@st.cache_resource
+def get_result_store():
+    return ResultStore()
+
+# One topic tree of drilled-down sub-clusters shared by every session in this process
+@st.cache_resource
+def get_topic_tree():
+    return TopicTree()
+
+# Append every trace to the JSON lines log, if one is configured, once per process
+@st.cache_resource
+def start_trace_log():
+    if TRACE_LOG_PATH:
+        enable_trace_log(TRACE_LOG_PATH)
+
+start_trace_log()
+
+# Identify this session's results in the shared store
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+session_id = st.session_state.session_id
+result_store = get_result_store()
 
 # Hero section
 st.markdown('<div class="hero-section">', unsafe_allow_html=True)
@@ -238,6 +166,27 @@ with st.sidebar:
     st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
     st.markdown("### Made with:")
     st.markdown("- 💻 Streamlit\n- 🤖 LangChain\n- 🧠 OpenAI GPT-3.5")
+    
+    # Model and connection pool settings; each combination gets one shared client
+    with st.expander("Model Settings"):
+        llm_settings = LLMSettings(
+            model=st.selectbox("Model", AVAILABLE_MODELS, index=AVAILABLE_MODELS.index(MODEL_NAME)),
+            temperature=st.slider("Temperature", 0.0, 1.5, MODEL_TEMPERATURE, 0.1),
+            max_connections=st.number_input("Connection pool size", 1, 100, LLM_MAX_CONNECTIONS),
+            timeout=float(st.number_input("Request timeout (seconds)", 5, 600, int(LLM_TIMEOUT_SECONDS))),
+            json_mode=st.checkbox(
+                "Structured JSON output",
+                value=LLM_JSON_MODE,
+                help="Ask the model for a guaranteed-valid JSON object. Turn off for models without JSON mode."
+            ),
+            hedge=st.checkbox(
+                "Hedge slow requests",
+                value=LLM_HEDGE_ENABLED,
+                help=f"Send a second identical request when a call runs past the p{LLM_HEDGE_PERCENTILE:g} latency "
+                     f"seen so far, and keep the first valid reply. At most {LLM_HEDGE_MAX_RATIO:.0%} of calls "
+                     f"are hedged. Streamed generations are not hedged."
+            ),
+        )
 
 # Main form in a container
 st.markdown('<div class="form-container">', unsafe_allow_html=True)
@@ -253,8 +202,8 @@ with st.form("cluster_form"):
     with col2:
         difficulty = st.selectbox(
             "Keyword Difficulty",
-            ["Low", "Medium", "High"],
-            help="Low difficulty keywords are easier to rank for, while high difficulty keywords are more competitive but may have higher search volume."
+            DIFFICULTY_LEVELS + [ALL_DIFFICULTIES],
+            help="Low difficulty keywords are easier to rank for, while high difficulty keywords are more competitive but may have higher search volume. Choose \"All difficulties\" to generate every level at once."
         )
         
         # Display visual indicator of selected difficulty
@@ -262,281 +211,631 @@ with st.form("cluster_form"):
             badge_color = "low-difficulty"
         elif difficulty == "Medium":
             badge_color = "medium-difficulty"
-        else:
+        elif difficulty == "High":
             badge_color = "high-difficulty"
+        else:
+            badge_color = "all-difficulty"
         
         st.markdown(f'<span class="difficulty-badge {badge_color}">{difficulty}</span>', unsafe_allow_html=True)
     
+    force_refresh = st.checkbox(
+        "Force refresh",
+        help="Ignore any cached result for this topic and difficulty and generate a fresh set of keywords."
+    )
+    
+    stream_results = st.checkbox(
+        "Stream keywords as they arrive",
+        value=True,
+        help="Show each keyword in the table as soon as the model finishes writing it."
+    )
+    
     submit_button = st.form_submit_button("✨ Generate Content Clusters")
 st.markdown('</div>', unsafe_allow_html=True)
 
-# Function to get difficulty-specific parameters
-def get_difficulty_parameters(difficulty):
-    if difficulty == "Low":
-        return {
-            "description": "keywords with minimal competition that are much easier to rank for",
-            "search_volume": "lower search volume (typically 10-300 monthly searches)",
-            "complexity": "can range from 1-2 words to longer specific phrases",
-            "examples": "short keywords with low competition, specific how-to guides, niche questions, micro-topics",
-            "competition": "low competition score (0-30%), few established websites ranking for these terms",
-            "kd_score": "KD (Keyword Difficulty) score below 30",
-            "serp_features": "fewer SERP features, less established content",
-            "intent": "often highly specific informational or long-tail transactional intent"
-        }
-    elif difficulty == "Medium":
-        return {
-            "description": "moderately competitive terms with decent traffic potential but still attainable",
-            "search_volume": "moderate search volume (typically 300-1,000 monthly searches)",
-            "complexity": "can range from 1-2 words to mid-length focused phrases",
-            "examples": "moderately competitive short keywords, specific questions, comparison posts, focused topic guides",
-            "competition": "medium competition score (30-60%), some established websites but ranking opportunities exist",
-            "kd_score": "KD (Keyword Difficulty) score between 30-60",
-            "serp_features": "some SERP features, moderate content quality needed",
-            "intent": "mix of informational and commercial intent"
-        }
-    else:  # High
-        return {
-            "description": "highly competitive keywords with strong traffic potential but difficult to rank for",
-            "search_volume": "high search volume (typically 1,000+ monthly searches)",
-            "complexity": "can be short terms (1-2 words) or broader phrases",
-            "examples": "highly competitive short keywords, major topic guides, competitive reviews, popular products or services",
-            "competition": "high competition score (60%+), many established websites with high authority",
-            "kd_score": "KD (Keyword Difficulty) score above 60",
-            "serp_features": "many SERP features, highly optimized content required",
-            "intent": "often commercial or navigational intent with high competition"
-        }
-
-# IMPROVED Function to generate content clusters with more appropriate keyword selection
-def generate_content_clusters(topic, difficulty):
-    # Use session state to track keywords
-    if topic not in st.session_state.all_generated_keywords:
-        st.session_state.all_generated_keywords[topic] = {}
-        
-    # Set up LangChain with OpenAI
-    llm = ChatOpenAI(temperature=0.7, model="gpt-3.5-turbo")
-    
-    # Get difficulty-specific parameters
-    difficulty_params = get_difficulty_parameters(difficulty)
-    
-    # Create the system prompt with improved guidance
-    system_prompt = f"""
-    Role: You are an experienced SEO specialist and content strategist with expertise in keyword difficulty analysis.
-    Task: Generate EXACTLY 20 highly relevant content clusters for the topic "{topic}" with "{difficulty}" difficulty level.
-
-    ---------------------------------------
-    DETAILED SEO KEYWORD DIFFICULTY CRITERIA
-    ---------------------------------------
-
-    FOR {difficulty.upper()} DIFFICULTY KEYWORDS:
-    - Description: {difficulty_params["description"]}
-    - Search Volume: {difficulty_params["search_volume"]}
-    - Word Count/Format: {difficulty_params["complexity"]}
-    - Competition Level: {difficulty_params["competition"]}
-    - Keyword Difficulty Score: {difficulty_params["kd_score"]}
-    - SERP Features: {difficulty_params["serp_features"]}
-    - User Intent: {difficulty_params["intent"]}
-    - Examples: {difficulty_params["examples"]}
-
-    SPECIFIC EXAMPLES FOR "{topic}" BY DIFFICULTY:
-    - LOW: Long-tail, specific phrases with clear intent (e.g., "{topic} for side sleepers with back pain", "best budget {topic} for hot sleepers")
-    - MEDIUM: Mid-competition phrases (e.g., "best {topic} brands", "{topic} vs memory foam", "affordable {topic}")
-    - HIGH: Short, competitive terms (e.g., "{topic}", "{topic} king", "buy {topic}", "{topic} reviews")
-
-    Process:
-    1. Generate EXACTLY 20 content cluster keywords for "{topic}" that are STRICTLY {difficulty.upper()} difficulty level.
-    2. Double-check each keyword against ALL criteria above to ensure it truly fits the {difficulty} difficulty profile.
-    3. Each keyword MUST include the main topic "{topic}" or a very close variant.
-    4. The keywords should be:
-       a. Genuinely popular and searched (not fabricated terms)
-       b. Directly relevant to "{topic}"
-       c. Diverse to cover different aspects of the topic
-       d. Suitable for creating multiple content pieces
-       
-    CRITICAL {difficulty.upper()} DIFFICULTY GUIDANCE:
-    
-    - For LOW difficulty: Focus on long-tail, specific phrases with clear intent but lower search volume
-    - For MEDIUM difficulty: Focus on mid-length phrases with moderate competition and search volume
-    - For HIGH difficulty: Focus on short, competitive terms with high search volume
-    
-    IMPORTANT: Your goal is to generate THE MOST REALISTIC AND ACCURATE {difficulty.upper()} difficulty keywords for "{topic}" that SEO professionals would actually target, not to artificially create unique terms.
-    
-    FORMAT OUTPUT JSON:
-    {{
-        "keywords": [
-            {{
-                "keyword": "Example {difficulty} Difficulty Keyword",
-                "difficulty_level": "{difficulty}",
-                "search_volume": "Estimated volume of XXX-XXX searches per month",
-                "competition_level": "XX% - {difficulty} competition",
-                "explanation": "Detailed explanation of why this is a {difficulty.lower()} difficulty keyword with specific SEO metrics",
-                "article_idea_1": "Specific title and brief description of a potential article",
-                "article_idea_2": "Specific title and brief description of another potential article"
-            }},
-            ... (19 more entries for a total of EXACTLY 20)
-        ]
-    }}
-
-    FINAL VALIDATION:
-    1. Count your keywords to confirm you have EXACTLY 20 entries
-    2. Review your final list and REMOVE any keywords that don't properly match the {difficulty} difficulty criteria
-    3. If you had to remove any keywords that didn't meet the criteria, replace them with new valid keywords to maintain EXACTLY 20 total.
-    """
-    
-    # Create the user message with proper difficulty emphasis and examples
-    user_prompt = f"""
-    Generate EXACTLY 20 content cluster keywords for: {topic}.
-    
-    I need STRICTLY {difficulty.upper()} difficulty level keywords that would be most appropriate for an SEO strategy.
-    
-    For {difficulty.upper()} difficulty keywords:
-    - Word count: {difficulty_params["complexity"]}
-    - Search volume: {difficulty_params["search_volume"]}
-    - Competition: {difficulty_params["competition"]} 
-    - KD score: {difficulty_params["kd_score"]}
-    
-    {difficulty.upper()} DIFFICULTY GUIDANCE WITH EXAMPLES:
-    - LOW: Long-tail phrases with specific intent (e.g., "best {topic} for side sleepers with back pain", "affordable {topic} for small apartments")
-    - MEDIUM: Mid-competition phrases with moderate search volume (e.g., "best {topic} brands", "{topic} vs traditional", "affordable {topic}")
-    - HIGH: Short, competitive terms with high search volume (e.g., "{topic}", "{topic} king", "buy {topic}", "{topic} reviews")
-    
-    Your response MUST be exactly 20 keywords with detailed SEO metrics for each, focusing on being realistic and accurate for the {difficulty} difficulty level.
-    """
-    
-    # Call the LLM
-    messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=user_prompt)
-    ]
-    
-    response = llm.invoke(messages)
-    
-    # Parse the JSON response with improved handling
+# Add the numeric metric columns, record the DataFrame in the result store under the current model
+# settings and number its rows for display
+def record_content_clusters(topic, difficulty, df):
+    df = add_metric_columns(df, difficulty)
+    result_store.put(session_id, topic, difficulty, df, generated_by=llm_settings.generation_key)
+    return number_rows(df)
+
+# Result for this topic (or a trivial variant of it) and difficulty already stored by any session with
+# the current model settings, recorded for this session too; None if it was never generated with them
+def reuse_stored_result(topic, difficulty):
+    stored = result_store.find(topic, difficulty, generated_by=llm_settings.generation_key)
+    if stored is None:
+        return None
+    return record_content_clusters(topic, difficulty, stored)
+
+# Generate content clusters for the form, reporting parse failures in the page.
+# Topics already generated with the same model settings are answered from the result store without
+# calling the model.
+def generate_content_clusters(topic, difficulty, force_refresh=False, on_keyword=None):
+    if not force_refresh:
+        stored = reuse_stored_result(topic, difficulty)
+        if stored is not None:
+            return stored
     try:
-        # Look for JSON content within the response
-        response_text = response.content
-        json_start = response_text.find('{')
-        json_end = response_text.rfind('}') + 1
-        if json_start >= 0 and json_end > json_start:
-            json_str = response_text[json_start:json_end]
-            result = json.loads(json_str)
-        else:
-            # Fallback if no JSON found
-            st.error("The API response didn't contain properly formatted JSON data.")
-            return None
-    except json.JSONDecodeError:
-        st.error("Could not parse the API response as JSON.")
+        df = fetch_content_clusters(
+            topic,
+            difficulty,
+            cache=get_keyword_cache(),
+            force_refresh=force_refresh,
+            on_keyword=on_keyword,
+            llm_settings=llm_settings
+        )
+    except ClusterGenerationError as e:
+        st.error(str(e))
         return None
-    
-    # Convert to DataFrame with exact count enforcement
-    if 'keywords' in result:
-        df = pd.DataFrame(result['keywords'])
-        
-        # ENSURE EXACTLY 20 KEYWORDS
-        if len(df) > 20:
-           df = df.iloc[:20]  # Take only the first 20
-        elif len(df) < 20:
-           # Silently handle the case when fewer than 20 keywords are returned
-           pass
-        
-        # Store these keywords in our session state tracker
-        st.session_state.all_generated_keywords[topic][difficulty] = df['keyword'].tolist()
-        
-        # Add a numbered index starting from 1 instead of 0
-        df.index = df.index + 1
-        
-        # Reset index to create a column with numbering starting from 1
-        df = df.reset_index().rename(columns={"index": "number"})
-        
-        return df
-    return None
+    if df is None:
+        return None
+    return record_content_clusters(topic, difficulty, df)
+
+# Generate every difficulty level concurrently, recording each table as it finishes.
+# Levels already generated for this topic with the same model settings are answered from the result store first.
+def generate_all_difficulties_for_session(topic, force_refresh=False):
+    levels = []
+    for level in DIFFICULTY_LEVELS:
+        stored = None if force_refresh else reuse_stored_result(topic, level)
+        if stored is not None:
+            yield level, stored, None
+        else:
+            levels.append(level)
+    if not levels:
+        return
+    for level, df, error in generate_all_difficulties(
+        topic, cache=get_keyword_cache(), force_refresh=force_refresh, llm_settings=llm_settings, levels=levels
+    ):
+        if df is not None:
+            df = record_content_clusters(topic, level, df)
+        yield level, df, error
+
+# Point out when this topic, or a near variant of it, was generated before
+def show_topic_matches():
+    match = result_store.index.find_topic(topic)
+    if match is not None:
+        if not force_refresh:
+            st.info(
+                f"\"{match['topic']}\" was already generated ({', '.join(match['difficulties'])} difficulty). "
+                f"Those results are reused without calling the model; tick \"Force refresh\" for a fresh set."
+            )
+        return
+    similar = result_store.index.similar(topic, limit=1, kind="topic")
+    if similar:
+        st.caption(f"💡 A similar topic was generated before: \"{similar[0]['topic']}\"")
 
 # Add a feature to show previously generated keywords for this topic
 def show_previous_results():
-    if topic in st.session_state.all_generated_keywords:
+    previous = result_store.session_results(session_id).get(result_store.index.topic_name(topic), {})
+    # Only show other difficulty levels
+    others = {diff: previous_df for diff, previous_df in previous.items() if diff != difficulty}
+    if others:
         st.markdown("### Previously Generated Keywords")
-        for diff, keywords in st.session_state.all_generated_keywords[topic].items():
-            if diff != difficulty and keywords:  # Only show other difficulty levels
-                with st.expander(f"Previously generated {diff} difficulty keywords for '{topic}'"):
-                    st.write(", ".join(keywords))
+        for diff, previous_df in others.items():
+            with st.expander(f"Previously generated {diff} difficulty keywords for '{topic}'"):
+                st.dataframe(previous_df, width="stretch", hide_index=True)
+
+# Render a generated keyword table with its success message and download button
+def render_content_clusters(df, topic, difficulty):
+    # Success message
+    st.markdown(f"""
+    <div class="success-message">
+        <h3>✅ Success!</h3>
+        <p>Generated {len(df)} content clusters for <strong>"{topic}"</strong> with <strong>{difficulty}</strong> difficulty!</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Add a difficulty badge column
+    if 'difficulty_level' not in df.columns:
+        df['difficulty_level'] = difficulty
+    
+    # Display the results in a nice table
+    st.subheader(f"Your Content Clusters ({difficulty} Difficulty)")
+    st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
+    with st.container():
+        st.markdown('<div class="table-container">', unsafe_allow_html=True)
+        st.dataframe(
+            df,
+            column_config={
+                "number": st.column_config.NumberColumn("No.", width="small"),
+                "keyword": st.column_config.TextColumn("Keyword", width="medium"),
+                "difficulty_level": st.column_config.TextColumn("Difficulty", width="small"),
+                "search_volume": st.column_config.TextColumn("Search Volume", width="medium"),
+                "competition_level": st.column_config.TextColumn("Competition", width="medium"),
+                "explanation": st.column_config.TextColumn("Explanation", width="large"),
+                "article_idea_1": st.column_config.TextColumn("Article Idea 1", width="large"),
+                "article_idea_2": st.column_config.TextColumn("Article Idea 2", width="large"),
+                "volume_min": st.column_config.NumberColumn("Min Volume", format="%d", width="small"),
+                "volume_max": st.column_config.NumberColumn("Max Volume", format="%d", width="small"),
+                "competition_pct": st.column_config.NumberColumn("Competition %", format="%.0f%%", width="small"),
+                "volume_out_of_range": st.column_config.CheckboxColumn("Volume Off-Range", width="small"),
+                "competition_out_of_range": st.column_config.CheckboxColumn("Competition Off-Range", width="small"),
+                "priority_score": st.column_config.ProgressColumn(
+                    "Priority", min_value=0, max_value=100, format="%.1f", width="small"
+                )
+            },
+            width="stretch",
+            height=400,
+            hide_index=True
+        )
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    if "volume_out_of_range" in df.columns:
+        off_range = int((df["volume_out_of_range"] | df["competition_out_of_range"]).sum())
+        if off_range:
+            st.caption(
+                f"⚠️ {off_range} keywords have a search volume or competition outside the {difficulty} difficulty ranges."
+            )
+    
+    # Download buttons; each payload is built only when its button is clicked
+    st.markdown("**📥 Download Content Clusters**")
+    for column, export_format in zip(st.columns(len(EXPORT_FORMATS)), EXPORT_FORMATS):
+        with column:
+            st.download_button(
+                label=export_format.upper(),
+                data=lambda export_format=export_format: export_bytes(df, export_format),
+                file_name=export_file_name(topic, difficulty, export_format),
+                mime=EXPORT_FORMATS[export_format],
+                on_click="ignore",
+                width="stretch",
+                key=f"download_{difficulty.lower()}_{export_format}",
+            )
 
 # Process form submission
 if submit_button:
     if not topic:
         st.error("Please enter a main topic of interest.")
+    elif difficulty == ALL_DIFFICULTIES:
+        # Show previous results first
+        show_topic_matches()
+        show_previous_results()
+        
+        with st.spinner("✨ Generating content clusters for all difficulty levels... This may take a minute."), \
+                traced("generate", topic=topic, difficulty=difficulty):
+            try:
+                for level, df, error in generate_all_difficulties_for_session(topic, force_refresh=force_refresh):
+                    if error is not None:
+                        st.error(f"{level} difficulty failed: {str(error)}")
+                    elif df is not None:
+                        with span("render", difficulty=level):
+                            render_content_clusters(df, topic, level)
+            except Exception as e:
+                st.error(f"An error occurred: {str(e)}")
     else:
         # Show previous results first
+        show_topic_matches()
         show_previous_results()
         
-        with st.spinner(f"✨ Generating {difficulty.lower()} difficulty content clusters... This may take a minute."):
+        with st.spinner(f"✨ Generating {difficulty.lower()} difficulty content clusters... This may take a minute."), \
+                traced("generate", topic=topic, difficulty=difficulty):
             try:
-                df = generate_content_clusters(topic, difficulty)
+                # Show streamed keywords in a live table until the full result is ready
+                live_table = st.empty()
+                streamed_keywords = []
+                
+                def show_streamed_keyword(keyword):
+                    streamed_keywords.append(keyword)
+                    live_table.dataframe(
+                        pd.DataFrame(streamed_keywords[:KEYWORD_COUNT]), width="stretch", hide_index=True
+                    )
+                
+                df = generate_content_clusters(
+                    topic,
+                    difficulty,
+                    force_refresh=force_refresh,
+                    on_keyword=show_streamed_keyword if stream_results else None
+                )
+                live_table.empty()
                 if df is not None:
-                    # Success message
-                    st.markdown(f"""
-                    <div class="success-message">
-                        <h3>✅ Success!</h3>
-                        <p>Generated {len(df)} content clusters for <strong>"{topic}"</strong> with <strong>{difficulty}</strong> difficulty!</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    # Add a difficulty badge column
-                    if 'difficulty_level' not in df.columns:
-                        df['difficulty_level'] = difficulty
-                    
-                    # Display the results in a nice table
-                    st.subheader("Your Content Clusters")
-                    st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
-                    with st.container():
-                        st.markdown('<div class="table-container">', unsafe_allow_html=True)
-                        st.dataframe(
-                            df,
-                            column_config={
-                                "number": st.column_config.NumberColumn("No.", width="small"),
-                                "keyword": st.column_config.TextColumn("Keyword", width="medium"),
-                                "difficulty_level": st.column_config.TextColumn("Difficulty", width="small"),
-                                "search_volume": st.column_config.TextColumn("Search Volume", width="medium"),
-                                "competition_level": st.column_config.TextColumn("Competition", width="medium"),
-                                "explanation": st.column_config.TextColumn("Explanation", width="large"),
-                                "article_idea_1": st.column_config.TextColumn("Article Idea 1", width="large"),
-                                "article_idea_2": st.column_config.TextColumn("Article Idea 2", width="large")
-                            },
-                            use_container_width=True,
-                            height=400,
-                            hide_index=True
-                        )
-                        st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    # Download button
-                    csv = df.to_csv(index=False)
-                    col1, col2, col3 = st.columns([1,2,1])
-                    with col2:
-                        st.download_button(
-                            label="📥 Download Content Clusters as CSV",
-                            data=csv,
-                            file_name=f"{topic.replace(' ', '_')}_{difficulty.lower()}_difficulty_content_clusters.csv",
-                            mime="text/csv",
-                            use_container_width=True,
-                        )
+                    with span("render", difficulty=difficulty):
+                        render_content_clusters(df, topic, difficulty)
             except Exception as e:
                 st.error(f"An error occurred: {str(e)}")
 
-# Add a section to view all stored keywords across difficulty levels
-with st.expander("View All Generated Keywords By Topic", expanded=False):
-    if st.session_state.all_generated_keywords:
-        for t, difficulties in st.session_state.all_generated_keywords.items():
-            st.subheader(f"Topic: {t}")
-            for d, keywords in difficulties.items():
-                st.write(f"**{d} Difficulty:** {', '.join(keywords)}")
-            st.markdown("---")
+# Bulk mode: many topics from a CSV upload or pasted list
+st.markdown('<div class="form-container">', unsafe_allow_html=True)
+st.subheader("Bulk Topic Generation")
+st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
+
+with st.form("bulk_form"):
+    uploaded_file = st.file_uploader(
+        "Upload a CSV of topics",
+        type="csv",
+        help="Needs a 'topic' column. An optional 'difficulty' column (Low, Medium, High or All) overrides the levels selected below."
+    )
+    pasted_topics = st.text_area("Or paste topics, one per line", placeholder="Organic Gardening\nHome Composting")
+    bulk_difficulties = st.multiselect("Difficulty levels", DIFFICULTY_LEVELS, default=DIFFICULTY_LEVELS)
+    
+    bulk_col1, bulk_col2 = st.columns(2)
+    with bulk_col1:
+        bulk_concurrency = st.slider("Concurrent requests", 1, BULK_MAX_CONCURRENCY, 4)
+    with bulk_col2:
+        bulk_retries = st.number_input("Retries per topic", min_value=0, max_value=5, value=2)
+    
+    bulk_force_refresh = st.checkbox("Force refresh", key="bulk_force_refresh")
+    bulk_submit = st.form_submit_button("🚀 Run Bulk Generation")
+st.markdown('</div>', unsafe_allow_html=True)
+
+if bulk_submit:
+    try:
+        bulk_jobs = parse_bulk_jobs(uploaded_file, pasted_topics, bulk_difficulties)
+    except Exception as e:
+        st.error(f"Could not read the topic list: {str(e)}")
+        bulk_jobs = []
+    
+    if not bulk_jobs:
+        st.error("Please upload a CSV or paste at least one topic, and select a difficulty level.")
     else:
-        st.write("No keywords generated yet.")
+        # Append each finished table to one combined CSV as results arrive
+        bulk_output = io.StringIO()
+        bulk_failures = []
+        completed = 0
+        progress = st.progress(0.0, text=f"Processing {len(bulk_jobs)} topic/difficulty combinations...")
+        for bulk_topic, level, df, error in run_bulk_jobs(
+            bulk_jobs,
+            bulk_concurrency,
+            int(bulk_retries),
+            cache=get_keyword_cache(),
+            force_refresh=bulk_force_refresh,
+            llm_settings=llm_settings
+        ):
+            completed += 1
+            if error is not None:
+                bulk_failures.append({"topic": bulk_topic, "difficulty": level, "error": str(error)})
+            else:
+                df = record_content_clusters(bulk_topic, level, df)
+                if 'difficulty_level' not in df.columns:
+                    df['difficulty_level'] = level
+                df.insert(0, "topic", bulk_topic)
+                df.reindex(columns=BULK_COLUMNS).to_csv(
+                    bulk_output, index=False, header=bulk_output.tell() == 0
+                )
+            progress.progress(
+                completed / len(bulk_jobs),
+                text=f"Finished {completed} of {len(bulk_jobs)} ({len(bulk_failures)} failed)"
+            )
+        st.session_state.bulk_output = bulk_output.getvalue()
+        st.session_state.bulk_failures = bulk_failures
+
+# Keep the latest bulk output downloadable across reruns
+if st.session_state.get("bulk_output") is not None:
+    if st.session_state.bulk_failures:
+        st.warning(f"{len(st.session_state.bulk_failures)} topic/difficulty combinations failed after retries.")
+        st.dataframe(pd.DataFrame(st.session_state.bulk_failures), width="stretch", hide_index=True)
+    if st.session_state.bulk_output:
+        st.download_button(
+            label="📥 Download Combined Bulk Results as CSV",
+            data=st.session_state.bulk_output,
+            file_name="bulk_content_clusters.csv",
+            mime="text/csv",
+            width="stretch",
+            key="download_bulk",
+        )
+
+# Download every stored result as one zip, with a file per topic and difficulty
+@st.fragment
+def show_export_bundle():
+    with st.expander("Export All Results", expanded=False):
+        scope = st.radio(
+            "Results to export",
+            ["This session", "All sessions (shared store)"],
+            horizontal=True,
+            help="The shared store holds the most recent result of every topic and difficulty generated on this server."
+        )
+        if scope == "This session":
+            results = result_store.session_results(session_id)
+        else:
+            results = result_store.latest_results()
+        export_format = st.selectbox("File format", list(EXPORT_FORMATS), key="bundle_format")
+        
+        table_count = sum(len(difficulties) for difficulties in results.values())
+        st.write(f"{len(results)} topics, {table_count} tables")
+        if table_count:
+            st.download_button(
+                label=f"📦 Download {export_format.upper()} Bundle (.zip)",
+                data=lambda: bundle_bytes(iter_results(results), export_format),
+                file_name=f"content_clusters_{export_format}.zip",
+                mime=BUNDLE_MIME,
+                on_click="ignore",
+                width="stretch",
+                key="download_bundle",
+            )
+
+# Show one page of a large table, with a page selector when it does not fit on one page
+def paginated_dataframe(df, key, page_size=HISTORY_PAGE_SIZE):
+    page_count = max(1, -(-len(df) // page_size))
+    page = 1
+    if page_count > 1:
+        page = st.number_input(f"Page (of {page_count})", 1, page_count, 1, key=key)
+    st.dataframe(
+        df.iloc[(page - 1) * page_size:page * page_size],
+        width="stretch",
+        hide_index=True
+    )
+
+# Near-duplicate and sub-cluster analysis, recomputed only when the stored results or settings change
+@st.cache_data(max_entries=32)
+def analyze_history(_history, session_id, version, analysis_topic, duplicate_threshold, group_threshold):
+    history = _history
+    if analysis_topic != "All topics":
+        history = history[history["topic"] == analysis_topic].reset_index(drop=True)
+    duplicates = near_duplicate_report(history, duplicate_threshold)
+    grouped = history.assign(sub_cluster=group_keywords(history["keyword"], group_threshold))
+    return duplicates, grouped.sort_values(["sub_cluster", "topic", "difficulty"])
+
+# Add a section to view all stored keywords across difficulty levels.
+# Fragments rerun on their own when their widgets change, and the tables are paginated,
+# so the cost of a rerun does not grow with the session's history.
+@st.fragment
+def show_all_results():
+    with st.expander("View All Generated Keywords By Topic", expanded=False):
+        all_results = result_store.session_frame(session_id)
+        if not all_results.empty:
+            sort_by_priority = "priority_score" in all_results.columns and st.checkbox(
+                "Sort by priority score", key="history_sort_priority"
+            )
+            if sort_by_priority:
+                all_results = all_results.sort_values("priority_score", ascending=False, na_position="last")
+            topics = list(all_results["topic"].unique())
+            page_count = max(1, -(-len(topics) // HISTORY_TOPICS_PER_PAGE))
+            page = 1
+            if page_count > 1:
+                page = st.number_input(f"Topic page (of {page_count})", 1, page_count, 1, key="history_topic_page")
+            for t in topics[(page - 1) * HISTORY_TOPICS_PER_PAGE:page * HISTORY_TOPICS_PER_PAGE]:
+                st.subheader(f"Topic: {t}")
+                topic_results = all_results[all_results["topic"] == t].drop(columns=["topic"])
+                paginated_dataframe(topic_results, key=f"history_page_{t}")
+                st.markdown("---")
+        else:
+            st.write("No keywords generated yet.")
+
+# Find near-duplicates across difficulty levels and group stored keywords into sub-clusters
+@st.fragment
+def show_history_analysis():
+    with st.expander("Near-Duplicates and Sub-Clusters", expanded=False):
+        history = result_store.session_frame(session_id)[["topic", "difficulty", "keyword"]]
+        if history.empty:
+            st.write("No keywords generated yet.")
+            return
+        
+        analysis_topic = st.selectbox("Topic", ["All topics"] + list(history["topic"].unique()))
+        duplicate_threshold = st.slider("Near-duplicate similarity", 0.5, 1.0, NEAR_DUPLICATE_THRESHOLD, 0.05)
+        group_threshold = st.slider("Sub-cluster similarity", 0.3, 0.95, GROUP_SIMILARITY_THRESHOLD, 0.05)
+        duplicates, grouped = analyze_history(
+            history,
+            session_id,
+            result_store.version(session_id),
+            analysis_topic,
+            duplicate_threshold,
+            group_threshold
+        )
+        
+        st.markdown(f"**{len(duplicates)} near-duplicate keywords** out of {len(grouped)}")
+        if not duplicates.empty:
+            paginated_dataframe(duplicates, key="duplicates_page")
+        st.markdown(f"**{grouped['sub_cluster'].nunique()} sub-clusters**")
+        paginated_dataframe(grouped, key="sub_clusters_page")
+
+# Expand any keyword of a stored result into sub-clusters, level by level, generating only the nodes opened
+@st.fragment
+def show_drilldown():
+    with st.expander("Drill Down Into Keywords", expanded=False):
+        results = result_store.session_results(session_id)
+        if not results:
+            st.write("No keywords generated yet.")
+            return
+        
+        roots = [(t, d) for t, difficulties in results.items() for d in difficulties]
+        root_topic, root_difficulty = st.selectbox(
+            "Content cluster",
+            roots,
+            index=len(roots) - 1,
+            format_func=lambda root: f"{root[0]} ({root[1]})",
+            key="drilldown_root"
+        )
+        tree = get_topic_tree()
+        # The top level is this session's own result; only sub-clusters are shared between sessions
+        root_df = results[root_topic][root_difficulty]
+        st.caption(
+            f"Select a row to open its sub-clusters. Expanding a keyword generates {DRILLDOWN_KEYWORD_COUNT} "
+            f"sub-clusters once; opened keywords are reused by every session."
+        )
+        
+        path = (root_topic,)
+        while True:
+            children = tree.node(path, root_difficulty, root_df)
+            if children is None:
+                if not st.button(f"🔎 Expand \"{path[-1]}\"", key=f"drilldown_expand_{'/'.join(path)}"):
+                    break
+                with st.spinner(f"Generating sub-clusters for \"{path[-1]}\"..."):
+                    try:
+                        children = tree.expand(
+                            path, root_difficulty, cache=get_keyword_cache(), llm_settings=llm_settings
+                        )
+                    except ClusterGenerationError as e:
+                        st.error(str(e))
+                        break
+            
+            st.markdown(f"**{' › '.join(path)}**")
+            columns = [
+                c for c in ["keyword", "search_volume", "competition_level", "priority_score", "article_idea_1"]
+                if c in children
+            ]
+            column_config = {
+                "priority_score": st.column_config.ProgressColumn(
+                    "Priority", min_value=0, max_value=100, format="%.1f", width="small"
+                )
+            }
+            # Every keyword of this table opens a node one level deeper; on the deepest level none can
+            if not tree.can_expand((*path, "")):
+                st.dataframe(children[columns], column_config=column_config, width="stretch", hide_index=True)
+                break
+            selection = st.dataframe(
+                children[columns],
+                column_config=column_config,
+                width="stretch",
+                hide_index=True,
+                on_select="rerun",
+                selection_mode="single-row",
+                key=f"drilldown_table_{'/'.join(path)}"
+            ).selection
+            if not selection.rows:
+                break
+            path = (*path, str(children["keyword"].iloc[selection.rows[0]]))
+        
+        # The whole opened tree as one hierarchical result
+        file_stem = export_file_name(root_topic, root_difficulty, "tree").rsplit(".", 1)[0]
+        tree_col1, tree_col2 = st.columns(2)
+        with tree_col1:
+            st.download_button(
+                label="📥 Cluster Tree (CSV)",
+                data=lambda: export_bytes(tree.to_frame(root_topic, root_difficulty, root_df), "csv"),
+                file_name=f"{file_stem}_tree.csv",
+                mime=EXPORT_FORMATS["csv"],
+                on_click="ignore",
+                width="stretch",
+                key="download_tree_csv",
+            )
+        with tree_col2:
+            st.download_button(
+                label="📥 Cluster Tree (JSON)",
+                data=lambda: json.dumps(tree.to_nested(root_topic, root_difficulty, root_df), indent=2, default=str),
+                file_name=f"{file_stem}_tree.json",
+                mime="application/json",
+                on_click="ignore",
+                width="stretch",
+                key="download_tree_json",
+            )
+
+# Search every stored topic and keyword as you type: word prefixes first, then near matches and typos
+@st.fragment
+def show_history_search():
+    with st.expander("Search Generated Topics and Keywords", expanded=False):
+        query = st.text_input("Search", placeholder="Start typing a topic or keyword...", key="history_search")
+        if not query:
+            index_stats = result_store.index.stats()
+            st.caption(f"{index_stats['topics']} topics and {index_stats['keywords']} keywords indexed.")
+            return
+        
+        started = time.perf_counter()
+        matches = result_store.index.search(query)
+        st.caption(f"{len(matches)} matches in {(time.perf_counter() - started) * 1000:.1f} ms")
+        if matches:
+            st.dataframe(
+                pd.DataFrame(matches),
+                column_config={
+                    "kind": st.column_config.TextColumn("Type", width="small"),
+                    "text": st.column_config.TextColumn("Match", width="large"),
+                    "topic": st.column_config.TextColumn("Topic", width="medium"),
+                    "difficulties": st.column_config.ListColumn("Difficulties", width="medium"),
+                    "score": st.column_config.NumberColumn("Score", format="%.2f", width="small"),
+                },
+                width="stretch",
+                hide_index=True
+            )
+
+show_export_bundle()
+show_history_search()
+show_drilldown()
+show_all_results()
+show_history_analysis()
 
 # Add button to clear all stored keywords
-if st.session_state.all_generated_keywords:
+if result_store.has_results(session_id):
     if st.button("Clear All Stored Keywords"):
-        st.session_state.all_generated_keywords = {}
+        result_store.clear_session(session_id)
         st.success("All stored keywords have been cleared.")
-        st.experimental_rerun()
+        st.rerun()
+
+# Cache statistics in the sidebar
+with st.sidebar:
+    cache = get_keyword_cache()
+    st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
+    st.markdown("### Response Cache")
+    cache_col1, cache_col2, cache_col3 = st.columns(3)
+    cache_col1.metric("Hits", cache.hits)
+    cache_col2.metric("Misses", cache.misses)
+    cache_col3.metric("Entries", cache.size())
+    if st.button("Clear Response Cache"):
+        cache.clear()
+        st.success("The response cache has been cleared.")
+    
+    # Shared result store usage
+    store_stats = result_store.stats()
+    st.markdown("### Result Store")
+    store_col1, store_col2, store_col3 = st.columns(3)
+    store_col1.metric("Results", store_stats["entries"])
+    store_col2.metric("Sessions", store_stats["sessions"])
+    store_col3.metric("Memory", f"{store_stats['total_bytes'] / (1024 * 1024):.1f} MB")
+    
+    # Shared LLM client and connection reuse statistics
+    client_stats = llm_registry.stats()
+    st.markdown("### LLM Connections")
+    pool_col1, pool_col2, pool_col3 = st.columns(3)
+    pool_col1.metric("Requests", client_stats["requests"])
+    pool_col2.metric("New Conns", client_stats["connections_opened"])
+    pool_col3.metric("Reuse", f"{client_stats['connection_reuse_rate']:.0%}")
+    st.caption(f"{client_stats['clients']} shared client(s) in this process")
+    
+    # Optional per-stage timings, token, cost and retry counters, and downloads of traces and metrics
+    if st.checkbox("Show diagnostics", help="Timing of each generation stage and usage counters for this process."):
+        st.markdown("### Diagnostics")
+        diag_col1, diag_col2, diag_col3 = st.columns(3)
+        diag_col1.metric("LLM Calls", metrics.counter_total("clusterapp_llm_calls_total"))
+        diag_col2.metric("Tokens", f"{metrics.counter_total('clusterapp_llm_tokens_total'):,}")
+        diag_col3.metric("Cost", f"${metrics.counter_total('clusterapp_llm_cost_usd_total'):.4f}")
+        diag_col4, diag_col5, diag_col6 = st.columns(3)
+        diag_col4.metric("Requests", metrics.counter_total("clusterapp_requests_total"))
+        diag_col5.metric("Retries", metrics.counter_total("clusterapp_retries_total"))
+        diag_col6.metric("Salvaged", metrics.counter_total("clusterapp_salvaged_responses_total"))
+        flight_stats = generation_flights.stats()
+        st.caption(
+            f"{flight_stats['coalesced']} request(s) shared an identical in-flight generation, "
+            f"{flight_stats['in_flight']} generating now"
+        )
+        hedge_stats = hedger.stats()
+        if hedge_stats["hedged"]:
+            st.caption(
+                f"{hedge_stats['hedged']} of {hedge_stats['calls']} hedgeable call(s) were hedged, "
+                f"{hedge_stats['hedge_wins']} won by the hedging request"
+            )
+        
+        # Rate limiter state per model: throttling, retries and the current adaptive concurrency limit
+        limiter_stats = rate_limiters.stats()
+        if limiter_stats:
+            st.markdown("**Rate limits**")
+            st.dataframe(
+                pd.DataFrame.from_dict(limiter_stats, orient="index").rename_axis("model").reset_index(),
+                width="stretch",
+                hide_index=True
+            )
+        
+        stage_summary = metrics.stage_summary()
+        if stage_summary:
+            st.markdown("**Stage latency (recent requests)**")
+            st.dataframe(pd.DataFrame(stage_summary), width="stretch", hide_index=True)
+            latest_trace = metrics.recent_traces()[-1]
+            st.markdown(f"**Latest trace** `{latest_trace['trace_id']}` ({latest_trace['duration_ms']:.0f} ms)")
+            st.dataframe(pd.DataFrame(latest_trace["spans"]), width="stretch", hide_index=True)
+        
+        st.download_button(
+            label="📥 Prometheus Metrics",
+            data=metrics.render_prometheus,
+            file_name="clusterapp_metrics.prom",
+            mime="text/plain",
+            on_click="ignore",
+            width="stretch",
+            key="download_metrics",
+        )
+        st.download_button(
+            label="📥 Recent Traces (JSON Lines)",
+            data=metrics.traces_jsonl,
+            file_name="clusterapp_traces.jsonl",
+            mime="application/x-ndjson",
+            on_click="ignore",
+            width="stretch",
+            key="download_traces",
+        )
 
 # Footer
 st.markdown("<footer>", unsafe_allow_html=True)
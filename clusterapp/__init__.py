@@ -0,0 +1,162 @@
+# Headless core of the Content Cluster Generator, importable without Streamlit or LangChain
+from clusterapp.bulk import parse_bulk_jobs, run_bulk_jobs
+from clusterapp.cache import KeywordCache, open_default_cache
+from clusterapp.config import (
+    AVAILABLE_MODELS,
+    BULK_COLUMNS,
+    BULK_MAX_CONCURRENCY,
+    DIFFICULTY_LEVELS,
+    DRILLDOWN_KEYWORD_COUNT,
+    DRILLDOWN_MAX_DEPTH,
+    GROUP_SIMILARITY_THRESHOLD,
+    HISTORY_SEARCH_LIMIT,
+    KEYWORD_COUNT,
+    LLM_HEDGE_ENABLED,
+    LLM_HEDGE_MAX_RATIO,
+    LLM_HEDGE_PERCENTILE,
+    LLM_JSON_MODE,
+    LLM_MAX_CONNECTIONS,
+    LLM_TIMEOUT_SECONDS,
+    METRIC_COLUMNS,
+    MODEL_NAME,
+    MODEL_TEMPERATURE,
+    NEAR_DUPLICATE_THRESHOLD,
+    SIMILAR_TOPIC_THRESHOLD,
+    TRACE_LOG_PATH,
+)
+from clusterapp.dedupe import (
+    drop_near_duplicates,
+    group_keywords,
+    keyword_vectors,
+    near_duplicate_labels,
+    near_duplicate_report,
+)
+from clusterapp.difficulty import get_difficulty_parameters
+from clusterapp.exceptions import ClusterGenerationError, ProviderUnavailableError, SharedRequestError
+from clusterapp.export import (
+    BUNDLE_MIME,
+    EXPORT_FORMATS,
+    bundle_bytes,
+    export_bytes,
+    export_file_name,
+    iter_results,
+    write_bundle,
+    write_frame,
+)
+from clusterapp.generator import (
+    coalesced_keyword_set,
+    fetch_content_clusters,
+    generate_all_difficulties,
+    generate_content_clusters,
+    generation_flights,
+    number_rows,
+)
+from clusterapp.hedging import CancelToken, Hedger, hedger
+from clusterapp.llm import LLMClientRegistry, LLMSettings, get_llm, llm_registry
+from clusterapp.metrics import (
+    MetricsRegistry,
+    enable_trace_log,
+    metrics,
+    record_llm_usage,
+    span,
+    traced,
+)
+from clusterapp.prompts import (
+    build_drilldown_user_prompt,
+    build_prompts,
+    build_system_prompt,
+    build_user_prompt,
+    count_tokens,
+    prompt_token_report,
+)
+from clusterapp.ratelimit import RateLimiter, TokenBucket, rate_limiters
+from clusterapp.scoring import add_metric_columns, parse_competition, parse_search_volume
+from clusterapp.search import HistoryIndex
+from clusterapp.singleflight import SingleFlight
+from clusterapp.store import ResultStore, compact_frame
+from clusterapp.topics import normalize_topic, singularize
+from clusterapp.tree import TopicTree
+
+# The public API; everything above is re-exported from its module
+__all__ = [
+    "parse_bulk_jobs",
+    "run_bulk_jobs",
+    "KeywordCache",
+    "open_default_cache",
+    "AVAILABLE_MODELS",
+    "BULK_COLUMNS",
+    "BULK_MAX_CONCURRENCY",
+    "DIFFICULTY_LEVELS",
+    "DRILLDOWN_KEYWORD_COUNT",
+    "DRILLDOWN_MAX_DEPTH",
+    "GROUP_SIMILARITY_THRESHOLD",
+    "HISTORY_SEARCH_LIMIT",
+    "KEYWORD_COUNT",
+    "LLM_HEDGE_ENABLED",
+    "LLM_HEDGE_MAX_RATIO",
+    "LLM_HEDGE_PERCENTILE",
+    "LLM_JSON_MODE",
+    "LLM_MAX_CONNECTIONS",
+    "LLM_TIMEOUT_SECONDS",
+    "METRIC_COLUMNS",
+    "MODEL_NAME",
+    "MODEL_TEMPERATURE",
+    "NEAR_DUPLICATE_THRESHOLD",
+    "SIMILAR_TOPIC_THRESHOLD",
+    "TRACE_LOG_PATH",
+    "drop_near_duplicates",
+    "group_keywords",
+    "keyword_vectors",
+    "near_duplicate_labels",
+    "near_duplicate_report",
+    "get_difficulty_parameters",
+    "ClusterGenerationError",
+    "ProviderUnavailableError",
+    "SharedRequestError",
+    "BUNDLE_MIME",
+    "EXPORT_FORMATS",
+    "bundle_bytes",
+    "export_bytes",
+    "export_file_name",
+    "iter_results",
+    "write_bundle",
+    "write_frame",
+    "coalesced_keyword_set",
+    "fetch_content_clusters",
+    "generate_all_difficulties",
+    "generate_content_clusters",
+    "generation_flights",
+    "number_rows",
+    "CancelToken",
+    "Hedger",
+    "hedger",
+    "LLMClientRegistry",
+    "LLMSettings",
+    "get_llm",
+    "llm_registry",
+    "MetricsRegistry",
+    "enable_trace_log",
+    "metrics",
+    "record_llm_usage",
+    "span",
+    "traced",
+    "build_drilldown_user_prompt",
+    "build_prompts",
+    "build_system_prompt",
+    "build_user_prompt",
+    "count_tokens",
+    "prompt_token_report",
+    "RateLimiter",
+    "TokenBucket",
+    "rate_limiters",
+    "add_metric_columns",
+    "parse_competition",
+    "parse_search_volume",
+    "HistoryIndex",
+    "SingleFlight",
+    "ResultStore",
+    "compact_frame",
+    "normalize_topic",
+    "singularize",
+    "TopicTree",
+]
@@ -0,0 +1,3 @@
+from clusterapp.cli import main
+
+raise SystemExit(main())
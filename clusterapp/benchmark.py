@@ -0,0 +1,473 @@
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from clusterapp.config import (
+    DIFFICULTY_LEVELS,
+    KEYWORD_COUNT,
+    LLM_BACKOFF_BASE_SECONDS,
+    LLM_HEDGE_MAX_RATIO,
+    LLM_HEDGE_PERCENTILE,
+    LLM_MAX_CONCURRENCY,
+)
+from clusterapp.generator import generate_content_clusters
+from clusterapp.hedging import hedger
+from clusterapp.llm import LLMSettings, llm_registry
+from clusterapp.parsing import parse_keywords_response
+from clusterapp.ratelimit import TokenBucket, rate_limiters
+
+# Model name the fake client is registered under, so it never shares a client with real settings
+FAKE_MODEL_NAME = "benchmark-fake"
+
+# Word lists the fake model combines into distinct keywords
+KEYWORD_MODIFIERS = [
+    "best", "affordable", "organic", "beginner", "professional", "indoor", "outdoor", "small space",
+    "advanced", "seasonal", "sustainable", "diy", "commercial", "urban", "premium", "quick",
+]
+KEYWORD_SUFFIXES = [
+    "tools", "tips", "mistakes", "checklist", "schedule", "costs", "courses", "books",
+    "supplies", "techniques", "trends", "calendar", "kits", "services", "plans", "ideas",
+]
+
+# Error raised by the fake model, shaped like an OpenAI API status error
+class FakeProviderError(Exception):
+    def __init__(self, status_code, message, retry_after=None):
+        super().__init__(f"Error code: {status_code} - {message}")
+        self.status_code = status_code
+        headers = {} if retry_after is None else {"retry-after": f"{retry_after:.3f}"}
+        self.response = SimpleNamespace(status_code=status_code, headers=headers)
+
+# Local stand-in for ChatOpenAI with invoke() and stream(). Replies are deterministic for a
+# given seed and prompt. Latency is time to first token plus the reply's tokens at token_rate.
+# A tail_rate share of calls are stragglers whose time to first token is tail_multiplier times longer.
+# requests_per_minute enforces a provider quota, answering calls over it with HTTP 429.
+class FakeChatModel:
+    def __init__(
+        self, latency=0.05, token_rate=20000, malformed_rate=0.0, short_rate=0.0, seed=0, chars_per_token=4,
+        requests_per_minute=0, server_error_rate=0.0, tail_rate=0.0, tail_multiplier=10.0
+    ):
+        self.latency = latency
+        self.token_rate = token_rate
+        self.malformed_rate = malformed_rate
+        self.short_rate = short_rate
+        self.seed = seed
+        self.chars_per_token = chars_per_token
+        self.requests_per_minute = requests_per_minute
+        self.server_error_rate = server_error_rate
+        self.tail_rate = tail_rate
+        self.tail_multiplier = tail_multiplier
+        self._lock = threading.Lock()
+        self.reset()
+
+    # Forget earlier calls so a scenario's replies do not depend on what ran before it
+    def reset(self):
+        with self._lock:
+            self._prompt_counts = {}
+            self._quota = TokenBucket(self.requests_per_minute)
+            self.calls = 0
+            self.rejected = 0
+
+    # Enforce the quota with a continuously replenishing bucket, as providers do
+    def _admit(self):
+        retry_after = self._quota.try_acquire(1)
+        if retry_after:
+            with self._lock:
+                self.rejected += 1
+            raise FakeProviderError(429, "Rate limit reached", retry_after=retry_after)
+
+    # Seeded generator for this prompt's n-th call, independent of thread scheduling
+    def _random_for(self, prompt):
+        with self._lock:
+            self.calls += 1
+            attempt = self._prompt_counts.get(prompt, 0)
+            self._prompt_counts[prompt] = attempt + 1
+        return random.Random(f"{self.seed}:{attempt}:{prompt}")
+
+    # The reply text and its time to first token
+    def _reply(self, messages):
+        self._admit()
+        user_prompt = messages[-1].content
+        rng = self._random_for(user_prompt)
+        if rng.random() < self.server_error_rate:
+            raise FakeProviderError(503, "The server is overloaded")
+        topic_match = re.search(r'Topic: "(.*)"', user_prompt)
+        topic = topic_match.group(1) if topic_match else "topic"
+        count_match = re.search(r"generate EXACTLY (\d+) additional", user_prompt)
+        count = int(count_match.group(1)) if count_match else KEYWORD_COUNT
+        difficulty = next((level for level in DIFFICULTY_LEVELS if level.upper() in user_prompt), "Low")
+
+        if rng.random() < self.short_rate:
+            count = rng.randint(1, max(1, count - 1))
+        pairs = rng.sample([(m, s) for m in KEYWORD_MODIFIERS for s in KEYWORD_SUFFIXES], count)
+        keywords = [
+            {
+                "keyword": f"{modifier} {topic} {suffix}",
+                "difficulty_level": difficulty,
+                "search_volume": f"Estimated volume of {rng.randint(10, 900)}0 searches per month",
+                "competition_level": f"{rng.randint(5, 95)}% - {difficulty} competition",
+                "explanation": f"Benchmark keyword about {suffix} for {modifier} {topic}.",
+                "article_idea_1": f"The {modifier} guide to {topic} {suffix}",
+                "article_idea_2": f"{suffix.capitalize()} every {topic} fan should know",
+            }
+            for modifier, suffix in pairs
+        ]
+        text = json.dumps({"keywords": keywords}, indent=4)
+        if rng.random() < self.malformed_rate:
+            # Cut the reply off partway, as a truncated or interrupted response would be
+            text = text[:rng.randint(len(text) // 3, len(text) - 10)]
+        # Drawn last, so stragglers do not change the replies of a seed
+        latency = self.latency * (self.tail_multiplier if rng.random() < self.tail_rate else 1)
+        return text, latency
+
+    # Token usage reported with the reply, as the OpenAI API does, so no tokenizer is needed
+    def _usage(self, messages, text):
+        prompt_chars = sum(len(message.content) for message in messages)
+        return {
+            "input_tokens": prompt_chars // self.chars_per_token,
+            "output_tokens": len(text) // self.chars_per_token,
+        }
+
+    def _generation_seconds(self, text):
+        if not self.token_rate:
+            return 0.0
+        return len(text) / self.chars_per_token / self.token_rate
+
+    def invoke(self, messages):
+        text, latency = self._reply(messages)
+        time.sleep(latency + self._generation_seconds(text))
+        return SimpleNamespace(content=text, usage_metadata=self._usage(messages, text))
+
+    def stream(self, messages, chunk_tokens=16):
+        text, latency = self._reply(messages)
+        time.sleep(latency)
+        chunk_size = chunk_tokens * self.chars_per_token
+        for start in range(0, len(text), chunk_size):
+            chunk = text[start:start + chunk_size]
+            time.sleep(self._generation_seconds(chunk))
+            last = start + chunk_size >= len(text)
+            yield SimpleNamespace(content=chunk, usage_metadata=self._usage(messages, text) if last else None)
+
+# Latency percentiles in milliseconds
+def latency_summary(latencies):
+    if not latencies:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    p50, p95, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 95, 99])
+    return {"p50_ms": round(p50, 2), "p95_ms": round(p95, 2), "p99_ms": round(p99, 2)}
+
+# Failures of one scenario by exception type, keeping the first traceback so a broken system
+# under test is told apart from a slow one
+class FailureLog:
+    def __init__(self):
+        self.types = Counter()
+        self.first_traceback = None
+
+    def record(self, error):
+        self.types[type(error).__name__] += 1
+        if self.first_traceback is None:
+            self.first_traceback = "".join(traceback.format_exception(error))
+
+    # A call that returned nothing without raising
+    def record_empty(self):
+        self.types["no result"] += 1
+
+    @property
+    def count(self):
+        return sum(self.types.values())
+
+    def summary(self):
+        return {
+            "errors": self.count,
+            "error_types": ", ".join(f"{name} x{count}" for name, count in self.types.most_common()),
+            "first_traceback": self.first_traceback,
+        }
+
+# Run a function while tracking peak Python memory, returning (result, peak MB)
+def measure_peak_memory(function, *args, **kwargs):
+    tracemalloc.start()
+    try:
+        result = function(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, round(peak / 1024 / 1024, 2)
+
+# Generate clusters for every topic with the given number of workers, timing each call
+def _drive_generation(topics, difficulty, concurrency, llm_settings, stream):
+    latencies = []
+    failures = FailureLog()
+
+    def timed(topic):
+        started = time.perf_counter()
+        on_keyword = (lambda keyword: None) if stream else None
+        df = generate_content_clusters(topic, difficulty, on_keyword=on_keyword, llm_settings=llm_settings)
+        return time.perf_counter() - started, df
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(timed, topic) for topic in topics]
+        for future in as_completed(futures):
+            try:
+                latency, df = future.result()
+            except Exception as error:
+                failures.record(error)
+                continue
+            if df is None:
+                failures.record_empty()
+            latencies.append(latency)
+    return latencies, failures
+
+# Benchmark generate_content_clusters end to end against a fake model (no cache, no network).
+# limiter_settings configure a fresh rate limiter for the scenario; by default nothing is limited.
+# With hedge, slow calls are hedged at a percentile of the latencies seen so far, including those of
+# the unhedged run before it when keep_history is set.
+def benchmark_generation(
+    topic_count, concurrency, fake, difficulty="Low", stream=False, trace_memory=True, limiter_settings=None,
+    hedge=False, keep_history=False
+):
+    llm_settings = LLMSettings(model=FAKE_MODEL_NAME, hedge=hedge)
+    llm_registry.register(llm_settings, fake)
+    if not keep_history:
+        hedger.clear()
+    hedge_before = hedger.stats()
+    limiter = rate_limiters.configure(
+        FAKE_MODEL_NAME, **{"requests_per_minute": 0, "tokens_per_minute": 0, **(limiter_settings or {})}
+    )
+    topics = [f"benchmark topic {i}" for i in range(topic_count)]
+    fake.reset()
+
+    started = time.perf_counter()
+    if trace_memory:
+        (latencies, failures), peak_mb = measure_peak_memory(
+            _drive_generation, topics, difficulty, concurrency, llm_settings, stream
+        )
+    else:
+        latencies, failures = _drive_generation(topics, difficulty, concurrency, llm_settings, stream)
+        peak_mb = None
+    wall_seconds = time.perf_counter() - started
+    limiter_stats = limiter.stats()
+    hedge_stats = hedger.stats()
+
+    return {
+        "scenario": "hedged generation" if hedge else "generation",
+        "topics": topic_count,
+        "concurrency": concurrency,
+        **failures.summary(),
+        "llm_calls": fake.calls,
+        "throttled": fake.rejected,
+        "retries": limiter_stats["retries"],
+        "concurrency_limit": limiter_stats["concurrency_limit"],
+        "hedged": hedge_stats["hedged"] - hedge_before["hedged"],
+        "hedge_wins": hedge_stats["hedge_wins"] - hedge_before["hedge_wins"],
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_per_second": round(topic_count / wall_seconds, 2),
+        **latency_summary(latencies),
+        "peak_memory_mb": peak_mb,
+    }
+
+# Benchmark parsing replies into DataFrames on their own, without any model latency
+def benchmark_parsing(iterations, fake, trace_memory=True):
+    fake = FakeChatModel(
+        latency=0, token_rate=0, malformed_rate=fake.malformed_rate, short_rate=fake.short_rate, seed=fake.seed
+    )
+    messages = [SimpleNamespace(content=f'Topic: "benchmark topic {i}"') for i in range(iterations)]
+    replies = [fake.invoke([message]).content for message in messages]
+
+    def parse_all():
+        latencies = []
+        failures = FailureLog()
+        for reply in replies:
+            started = time.perf_counter()
+            try:
+                parse_keywords_response(reply)
+            except Exception as error:
+                failures.record(error)
+            latencies.append(time.perf_counter() - started)
+        return latencies, failures
+
+    started = time.perf_counter()
+    if trace_memory:
+        (latencies, failures), peak_mb = measure_peak_memory(parse_all)
+    else:
+        (latencies, failures), peak_mb = parse_all(), None
+    wall_seconds = time.perf_counter() - started
+
+    return {
+        "scenario": "parsing",
+        "topics": iterations,
+        "concurrency": 1,
+        **failures.summary(),
+        "llm_calls": 0,
+        "throttled": 0,
+        "retries": 0,
+        "concurrency_limit": 1,
+        "hedged": 0,
+        "hedge_wins": 0,
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_per_second": round(iterations / wall_seconds, 2),
+        **latency_summary(latencies),
+        "peak_memory_mb": peak_mb,
+    }
+
+# Run the parsing benchmark and every (topic count, concurrency) generation scenario.
+# With hedge, each scenario runs unhedged and then hedged: the same replies and stragglers, hedged
+# at a percentile of the latencies the unhedged run recorded, so the tail latencies compare directly.
+def run_benchmarks(
+    topic_counts=(1, 10, 50), concurrency_levels=(1, 4, 8), fake=None, difficulty="Low", stream=False,
+    trace_memory=True, limiter_settings=None, hedge=False
+):
+    fake = fake or FakeChatModel()
+    results = [benchmark_parsing(max(topic_counts), fake, trace_memory)]
+    for topic_count in topic_counts:
+        for concurrency in concurrency_levels:
+            results.append(benchmark_generation(
+                topic_count, concurrency, fake, difficulty, stream, trace_memory, limiter_settings
+            ))
+            if hedge:
+                results.append(benchmark_generation(
+                    topic_count, concurrency, fake, difficulty, stream, trace_memory, limiter_settings,
+                    hedge=True, keep_history=True
+                ))
+    return results
+
+# Build the command line parser
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m clusterapp.benchmark",
+        description="Benchmark content cluster generation offline against a deterministic fake LLM."
+    )
+    parser.add_argument(
+        "--topics", type=int, nargs="+", default=[1, 10, 50],
+        help="Topic counts to run (default: 1 10 50)"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 4, 8],
+        help="Concurrency levels to run (default: 1 4 8)"
+    )
+    parser.add_argument("-d", "--difficulty", choices=DIFFICULTY_LEVELS, default="Low")
+    parser.add_argument(
+        "--latency", type=float, default=0.05,
+        help="Fake time to first token in seconds (default: 0.05)"
+    )
+    parser.add_argument(
+        "--token-rate", type=float, default=20000,
+        help="Fake output tokens per second, 0 for instant (default: 20000)"
+    )
+    parser.add_argument(
+        "--malformed-rate", type=float, default=0.0,
+        help="Share of replies cut off mid-JSON (default: 0)"
+    )
+    parser.add_argument(
+        "--short-rate", type=float, default=0.0,
+        help="Share of replies with fewer keywords than requested (default: 0)"
+    )
+    parser.add_argument(
+        "--provider-rpm", type=int, default=0,
+        help="Fake provider quota in requests per minute, answered with 429 above it (default: unlimited)"
+    )
+    parser.add_argument(
+        "--server-error-rate", type=float, default=0.0,
+        help="Share of calls failing with HTTP 503 (default: 0)"
+    )
+    parser.add_argument(
+        "--tail-rate", type=float, default=0.0,
+        help="Share of calls that are stragglers with a much longer time to first token (default: 0)"
+    )
+    parser.add_argument(
+        "--tail-multiplier", type=float, default=10.0,
+        help="How many times slower a straggler's time to first token is (default: 10)"
+    )
+    parser.add_argument(
+        "--hedge", action="store_true",
+        help="Also run every generation scenario with hedging, after its unhedged run. Stragglers "
+             "(--tail-rate) must be rarer than 100 minus --hedge-percentile percent to be hedged"
+    )
+    parser.add_argument(
+        "--hedge-percentile", type=float, default=LLM_HEDGE_PERCENTILE,
+        help=f"Latency percentile after which a call is hedged (default: {LLM_HEDGE_PERCENTILE:g})"
+    )
+    parser.add_argument(
+        "--hedge-budget", type=float, default=LLM_HEDGE_MAX_RATIO,
+        help=f"Largest share of calls that may be hedged (default: {LLM_HEDGE_MAX_RATIO:g})"
+    )
+    parser.add_argument(
+        "--rpm", type=int, default=0,
+        help="Client rate limiter requests per minute (default: unlimited)"
+    )
+    parser.add_argument(
+        "--tpm", type=int, default=0,
+        help="Client rate limiter tokens per minute (default: unlimited)"
+    )
+    parser.add_argument(
+        "--max-concurrency", type=int, default=LLM_MAX_CONCURRENCY,
+        help=f"Ceiling of the adaptive concurrency limit (default: {LLM_MAX_CONCURRENCY})"
+    )
+    parser.add_argument(
+        "--backoff-base", type=float, default=LLM_BACKOFF_BASE_SECONDS,
+        help=f"Base of the exponential backoff in seconds (default: {LLM_BACKOFF_BASE_SECONDS:g})"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the fake model's replies (default: 0)")
+    parser.add_argument("--stream", action="store_true", help="Stream replies through the incremental parser")
+    parser.add_argument(
+        "--no-memory", dest="trace_memory", action="store_false",
+        help="Skip peak memory tracking, which slows the measured code down"
+    )
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    fake = FakeChatModel(
+        latency=args.latency,
+        token_rate=args.token_rate,
+        malformed_rate=args.malformed_rate,
+        short_rate=args.short_rate,
+        seed=args.seed,
+        requests_per_minute=args.provider_rpm,
+        server_error_rate=args.server_error_rate,
+        tail_rate=args.tail_rate,
+        tail_multiplier=args.tail_multiplier
+    )
+    hedger.percentile = args.hedge_percentile
+    hedger.max_ratio = args.hedge_budget
+    limiter_settings = {
+        "requests_per_minute": args.rpm,
+        "tokens_per_minute": args.tpm,
+        "max_concurrency": args.max_concurrency,
+        "backoff_base": args.backoff_base,
+    }
+    results = run_benchmarks(
+        args.topics, args.concurrency, fake, args.difficulty, args.stream, args.trace_memory, limiter_settings,
+        args.hedge
+    )
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(pd.DataFrame(results).drop(columns="first_traceback").to_string(index=False))
+
+    first_failure = next((result for result in results if result["first_traceback"]), None)
+    if first_failure is not None:
+        print(
+            f"\nFirst failure ({first_failure['scenario']}, {first_failure['topics']} topics, "
+            f"concurrency {first_failure['concurrency']}):\n{first_failure['first_traceback']}",
+            file=sys.stderr
+        )
+    # A scenario in which every attempt failed measured a broken system, not a slow one
+    broken = [result for result in results if result["topics"] and result["errors"] == result["topics"]]
+    if broken:
+        print(f"{len(broken)} of {len(results)} scenarios failed on every attempt.", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,82 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from clusterapp.config import BULK_RETRY_BACKOFF_SECONDS, DIFFICULTY_LEVELS
+from clusterapp.exceptions import ClusterGenerationError
+from clusterapp.generator import fetch_content_clusters
+from clusterapp.metrics import metrics
+from clusterapp.topics import normalize_topic
+
+# Parse an uploaded CSV and/or pasted topic list into unique (topic, difficulty) jobs
+def parse_bulk_jobs(csv_file=None, pasted_topics="", default_difficulties=DIFFICULTY_LEVELS):
+    rows = []
+    if csv_file is not None:
+        upload_df = pd.read_csv(csv_file, dtype=str).fillna("")
+        columns = {c.strip().lower(): c for c in upload_df.columns}
+        if "topic" not in columns:
+            raise ValueError("The uploaded CSV needs a 'topic' column.")
+        difficulty_column = columns.get("difficulty")
+        for _, row in upload_df.iterrows():
+            value = row[difficulty_column].strip().capitalize() if difficulty_column else ""
+            rows.append((row[columns["topic"]], value))
+    for line in pasted_topics.splitlines():
+        rows.append((line, ""))
+
+    jobs = []
+    seen = set()
+    for raw_topic, value in rows:
+        topic = " ".join(raw_topic.split())
+        if not topic:
+            continue
+        # A per-row difficulty overrides the selection; "All" expands to every level
+        if value in DIFFICULTY_LEVELS:
+            levels = [value]
+        elif value == "All":
+            levels = DIFFICULTY_LEVELS
+        else:
+            levels = default_difficulties
+        for level in levels:
+            if (normalize_topic(topic), level) not in seen:
+                seen.add((normalize_topic(topic), level))
+                jobs.append((topic, level))
+    return jobs
+
+# Fetch one bulk job, retrying with exponential backoff before giving up
+def fetch_with_retries(topic, difficulty, cache, force_refresh, max_retries, llm_settings=None):
+    for attempt in range(max_retries + 1):
+        try:
+            df = fetch_content_clusters(
+                topic, difficulty, cache=cache, force_refresh=force_refresh, llm_settings=llm_settings
+            )
+            if df is not None:
+                return df
+            error = ClusterGenerationError("The API response didn't contain any keywords.")
+        except Exception as e:
+            error = e
+        if attempt < max_retries:
+            metrics.increment("clusterapp_retries_total")
+            time.sleep(BULK_RETRY_BACKOFF_SECONDS * 2 ** attempt)
+    raise error
+
+# Run bulk jobs on a bounded worker pool, yielding (topic, difficulty, df, error) as each finishes.
+# Closing the generator early (a Streamlit rerun or Stop) cancels the jobs that have not started
+# instead of waiting for all of them.
+def run_bulk_jobs(jobs, concurrency, max_retries, cache=None, force_refresh=False, llm_settings=None):
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        futures = {
+            executor.submit(
+                fetch_with_retries, topic, level, cache, force_refresh, max_retries, llm_settings
+            ): (topic, level)
+            for topic, level in jobs
+        }
+        for future in as_completed(futures):
+            topic, level = futures[future]
+            try:
+                yield topic, level, future.result(), None
+            except Exception as e:
+                yield topic, level, None, e
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
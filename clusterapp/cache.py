@@ -0,0 +1,89 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from clusterapp.config import CACHE_MAX_ENTRIES, CACHE_PATH, CACHE_TTL_SECONDS
+from clusterapp.topics import normalize_topic
+
+# SQLite-backed cache of parsed keyword DataFrames with TTL and LRU eviction
+class KeywordCache:
+    def __init__(self, path, ttl_seconds, max_entries):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS keyword_cache (
+                cache_key TEXT PRIMARY KEY,
+                topic TEXT NOT NULL,
+                difficulty TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(topic, difficulty, model, system_prompt, user_prompt):
+        prompt_hash = hashlib.sha256(f"{system_prompt}\x00{user_prompt}".encode("utf-8")).hexdigest()
+        raw_key = "\x1f".join([normalize_topic(topic), difficulty.lower(), model, prompt_hash])
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, created_at FROM keyword_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM keyword_cache WHERE cache_key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE keyword_cache SET last_accessed = ? WHERE cache_key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+        return pd.DataFrame(json.loads(row[0]))
+
+    def put(self, key, topic, difficulty, df):
+        now = time.time()
+        payload = json.dumps(df.to_dict(orient="records"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO keyword_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (key, normalize_topic(topic), difficulty, payload, now, now)
+            )
+            # Drop expired entries, then the least recently used beyond the size bound
+            self._conn.execute(
+                "DELETE FROM keyword_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+            self._conn.execute("""
+                DELETE FROM keyword_cache WHERE cache_key IN (
+                    SELECT cache_key FROM keyword_cache
+                    ORDER BY last_accessed DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            self._conn.commit()
+
+    def size(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM keyword_cache").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM keyword_cache")
+            self._conn.commit()
+
+# Open the cache configured through the CLUSTER_CACHE_* environment variables
+def open_default_cache():
+    return KeywordCache(CACHE_PATH, CACHE_TTL_SECONDS, CACHE_MAX_ENTRIES)
@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+import sys
+
+import pandas as pd
+
+from clusterapp.bulk import parse_bulk_jobs, run_bulk_jobs
+from clusterapp.cache import open_default_cache
+from clusterapp.config import (
+    BULK_COLUMNS,
+    BULK_MAX_CONCURRENCY,
+    DIFFICULTY_LEVELS,
+    LLM_HEDGE_ENABLED,
+    LLM_JSON_MODE,
+    LLM_MAX_CONNECTIONS,
+    LLM_TIMEOUT_SECONDS,
+    MODEL_NAME,
+    MODEL_TEMPERATURE,
+)
+from clusterapp.export import EXPORT_FORMATS, write_bundle, write_frame
+from clusterapp.generator import number_rows
+from clusterapp.llm import LLMSettings
+from clusterapp.metrics import enable_trace_log, metrics
+from clusterapp.prompts import prompt_token_report
+from clusterapp.scoring import add_metric_columns
+
+# "zip" writes one CSV per topic and difficulty instead of a combined table
+OUTPUT_FORMATS = list(EXPORT_FORMATS) + ["json", "zip"]
+
+# Build the command line parser
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m clusterapp",
+        description="Generate SEO content clusters without starting the Streamlit app."
+    )
+    parser.add_argument("topic", nargs="?", help="Main topic of interest")
+    parser.add_argument(
+        "--topics-file",
+        help="CSV with a 'topic' column (and optional 'difficulty' column) for batch runs"
+    )
+    parser.add_argument(
+        "-d", "--difficulty",
+        choices=DIFFICULTY_LEVELS + ["All"],
+        default="Low",
+        help="Keyword difficulty level, or All for every level (default: Low)"
+    )
+    parser.add_argument("-o", "--output", default="-", help="Output path, or - for stdout (default: -)")
+    parser.add_argument(
+        "-f", "--format",
+        choices=OUTPUT_FORMATS,
+        help="Output format (default: taken from the output extension, else csv)"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=4,
+        help=f"Concurrent requests, 1-{BULK_MAX_CONCURRENCY} (default: 4)"
+    )
+    parser.add_argument("--retries", type=int, default=2, help="Retries per topic (default: 2)")
+    parser.add_argument("--model", default=MODEL_NAME, help=f"OpenAI chat model (default: {MODEL_NAME})")
+    parser.add_argument(
+        "--temperature", type=float, default=MODEL_TEMPERATURE,
+        help=f"Sampling temperature (default: {MODEL_TEMPERATURE})"
+    )
+    parser.add_argument(
+        "--max-connections", type=int, default=LLM_MAX_CONNECTIONS,
+        help=f"HTTP connection pool size (default: {LLM_MAX_CONNECTIONS})"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=LLM_TIMEOUT_SECONDS,
+        help=f"Request timeout in seconds (default: {LLM_TIMEOUT_SECONDS:g})"
+    )
+    parser.add_argument(
+        "--no-json-mode", dest="json_mode", action="store_false", default=LLM_JSON_MODE,
+        help="Do not request structured JSON output (for models without JSON mode)"
+    )
+    parser.add_argument(
+        "--hedge", action="store_true", default=LLM_HEDGE_ENABLED,
+        help="Send a second identical request when a call is slower than most recent calls"
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the response cache")
+    parser.add_argument("--force-refresh", action="store_true", help="Ignore cached results but store new ones")
+    parser.add_argument("--trace-log", help="Append a JSON record per traced request to this file")
+    parser.add_argument("--metrics-file", help="Write Prometheus text metrics to this file when done")
+    parser.add_argument(
+        "--prompt-report", action="store_true",
+        help="Print the input token count of each prompt template as JSON and exit"
+    )
+    return parser
+
+# Write the results in the requested format; results are (topic, difficulty, DataFrame) tuples
+def write_output(results, output, output_format):
+    if output_format == "json":
+        df = pd.concat([df for _, _, df in results], ignore_index=True)
+        df.to_json(sys.stdout if output == "-" else output, orient="records", indent=2, force_ascii=False)
+        return
+
+    target = sys.stdout.buffer if output == "-" else open(output, "wb")
+    try:
+        if output_format == "zip":
+            write_bundle(results, target, "csv")
+        else:
+            write_frame(pd.concat([df for _, _, df in results], ignore_index=True), target, output_format)
+    finally:
+        if target is not sys.stdout.buffer:
+            target.close()
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.prompt_report:
+        print(json.dumps(prompt_token_report(args.model), indent=2))
+        return 0
+    if not args.topic and not args.topics_file:
+        parser.error("give a topic or --topics-file")
+    if args.trace_log:
+        enable_trace_log(args.trace_log)
+
+    output_format = args.format
+    if output_format is None:
+        extension = os.path.splitext(args.output)[1].lstrip(".").lower()
+        output_format = extension if extension in OUTPUT_FORMATS else "csv"
+
+    default_difficulties = DIFFICULTY_LEVELS if args.difficulty == "All" else [args.difficulty]
+    jobs = parse_bulk_jobs(args.topics_file, args.topic or "", default_difficulties)
+    cache = None if args.no_cache else open_default_cache()
+    concurrency = max(1, min(args.concurrency, BULK_MAX_CONCURRENCY))
+    llm_settings = LLMSettings(
+        model=args.model,
+        temperature=args.temperature,
+        max_connections=args.max_connections,
+        timeout=args.timeout,
+        json_mode=args.json_mode,
+        hedge=args.hedge
+    )
+
+    results = []
+    failures = 0
+    for topic, level, df, error in run_bulk_jobs(
+        jobs,
+        concurrency,
+        args.retries,
+        cache=cache,
+        force_refresh=args.force_refresh,
+        llm_settings=llm_settings
+    ):
+        if error is not None:
+            failures += 1
+            print(f"{topic} ({level}): {error}", file=sys.stderr)
+            continue
+        df = add_metric_columns(number_rows(df), level)
+        if "difficulty_level" not in df.columns:
+            df["difficulty_level"] = level
+        df.insert(0, "topic", topic)
+        results.append((topic, level, df.reindex(columns=BULK_COLUMNS)))
+        print(f"{topic} ({level}): {len(df)} keywords", file=sys.stderr)
+
+    if results:
+        write_output(results, args.output, output_format)
+    if args.metrics_file:
+        metrics.write_prometheus(args.metrics_file)
+    return 1 if failures else 0
@@ -0,0 +1,99 @@
+import os
+
+# Model settings used for generation (also part of the cache key)
+MODEL_NAME = "gpt-3.5-turbo"
+MODEL_TEMPERATURE = 0.7
+
+# Models offered in the UI and shared HTTP connection pool settings
+AVAILABLE_MODELS = ["gpt-3.5-turbo", "gpt-4o-mini", "gpt-4o"]
+LLM_MAX_CONNECTIONS = int(os.environ.get("CLUSTER_LLM_MAX_CONNECTIONS", 10))
+LLM_TIMEOUT_SECONDS = float(os.environ.get("CLUSTER_LLM_TIMEOUT_SECONDS", 120))
+
+# Process-wide provider quota per model (0 disables a limit), retries with jittered exponential backoff
+# on 429/5xx, and the ceiling of the adaptive concurrency limit
+LLM_REQUESTS_PER_MINUTE = int(os.environ.get("CLUSTER_LLM_REQUESTS_PER_MINUTE", 500))
+LLM_TOKENS_PER_MINUTE = int(os.environ.get("CLUSTER_LLM_TOKENS_PER_MINUTE", 200000))
+LLM_MAX_CONCURRENCY = int(os.environ.get("CLUSTER_LLM_MAX_CONCURRENCY", 16))
+LLM_MAX_RETRIES = int(os.environ.get("CLUSTER_LLM_MAX_RETRIES", 5))
+LLM_BACKOFF_BASE_SECONDS = float(os.environ.get("CLUSTER_LLM_BACKOFF_BASE_SECONDS", 1))
+LLM_BACKOFF_MAX_SECONDS = float(os.environ.get("CLUSTER_LLM_BACKOFF_MAX_SECONDS", 60))
+LLM_BURST_SECONDS = float(os.environ.get("CLUSTER_LLM_BURST_SECONDS", 10))
+
+# Optional request hedging: a call still running past this percentile of recent latencies gets an identical
+# second request and the first valid reply wins. At most LLM_HEDGE_MAX_RATIO of calls may be hedged, and
+# nothing is hedged until LLM_HEDGE_MIN_SAMPLES latencies have been seen.
+LLM_HEDGE_ENABLED = os.environ.get("CLUSTER_LLM_HEDGE", "0") == "1"
+LLM_HEDGE_PERCENTILE = float(os.environ.get("CLUSTER_LLM_HEDGE_PERCENTILE", 95))
+LLM_HEDGE_MAX_RATIO = float(os.environ.get("CLUSTER_LLM_HEDGE_MAX_RATIO", 0.1))
+LLM_HEDGE_MIN_SAMPLES = int(os.environ.get("CLUSTER_LLM_HEDGE_MIN_SAMPLES", 20))
+LLM_HEDGE_HISTORY_SIZE = 500
+
+# Completion tokens reserved for a full keyword set before the real usage is known
+LLM_EXPECTED_COMPLETION_TOKENS = 3000
+
+# Ask the provider for a syntactically valid JSON object (OpenAI JSON mode)
+LLM_JSON_MODE = os.environ.get("CLUSTER_LLM_JSON_MODE", "1") != "0"
+
+# Difficulty levels that can be generated and the number of keywords requested per level
+DIFFICULTY_LEVELS = ["Low", "Medium", "High"]
+KEYWORD_COUNT = 20
+
+# Drill-down: sub-cluster keywords requested per expanded keyword, number of keyword levels below the
+# root topic (its own keywords are level 1) and the number of tree nodes kept in memory
+DRILLDOWN_KEYWORD_COUNT = 10
+DRILLDOWN_MAX_DEPTH = 3
+TOPIC_TREE_MAX_NODES = int(os.environ.get("CLUSTER_TOPIC_TREE_MAX_NODES", 2000))
+
+# Maximum follow-up requests made to fill in keywords missing from a short answer
+TOP_UP_MAX_ROUNDS = int(os.environ.get("CLUSTER_TOP_UP_MAX_ROUNDS", 2))
+
+# Persistent response cache settings
+CACHE_PATH = os.environ.get("CLUSTER_CACHE_PATH", "cluster_cache.sqlite3")
+CACHE_TTL_SECONDS = int(os.environ.get("CLUSTER_CACHE_TTL_SECONDS", 7 * 24 * 60 * 60))
+CACHE_MAX_ENTRIES = int(os.environ.get("CLUSTER_CACHE_MAX_ENTRIES", 500))
+
+# Memory caps for stored generation results, globally and per session
+RESULT_STORE_MAX_BYTES = int(os.environ.get("CLUSTER_RESULT_STORE_MAX_BYTES", 256 * 1024 * 1024))
+RESULT_STORE_SESSION_MAX_BYTES = int(os.environ.get("CLUSTER_RESULT_STORE_SESSION_MAX_BYTES", 16 * 1024 * 1024))
+
+# Bulk generation settings
+BULK_MAX_CONCURRENCY = 8
+BULK_RETRY_BACKOFF_SECONDS = 2
+
+# Numeric columns parsed from the free-text search volume and competition
+METRIC_COLUMNS = [
+    "volume_min", "volume_max", "competition_pct", "volume_out_of_range", "competition_out_of_range",
+    "priority_score"
+]
+
+# Column order of the combined bulk output
+BULK_COLUMNS = [
+    "topic", "number", "keyword", "difficulty_level", "search_volume",
+    "competition_level", "explanation", "article_idea_1", "article_idea_2"
+] + METRIC_COLUMNS
+
+# Monthly search volume that earns the full volume part of the priority score (log scale below it)
+PRIORITY_VOLUME_CEILING = 100000
+
+# Keyword similarity settings: hashed vector width, near-duplicate and sub-cluster cosine thresholds
+VECTOR_FEATURES = 1024
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get("CLUSTER_NEAR_DUPLICATE_THRESHOLD", 0.85))
+GROUP_SIMILARITY_THRESHOLD = float(os.environ.get("CLUSTER_GROUP_SIMILARITY_THRESHOLD", 0.6))
+
+# History search: results per lookup, and the trigram similarity above which a stored topic counts as
+# a near variant of a new one
+HISTORY_SEARCH_LIMIT = 10
+SIMILAR_TOPIC_THRESHOLD = float(os.environ.get("CLUSTER_SIMILAR_TOPIC_THRESHOLD", 0.8))
+
+# Tracing and metrics: recent traces kept for the diagnostics panel, plus optional JSON lines trace log
+# and Prometheus text file (e.g. for the node_exporter textfile collector)
+TRACE_HISTORY_SIZE = int(os.environ.get("CLUSTER_TRACE_HISTORY_SIZE", 200))
+TRACE_LOG_PATH = os.environ.get("CLUSTER_TRACE_LOG_PATH")
+METRICS_FILE_PATH = os.environ.get("CLUSTER_METRICS_FILE_PATH")
+
+# Price per million (prompt, completion) tokens in US dollars, for cost estimates
+MODEL_PRICES_PER_MILLION = {
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
@@ -0,0 +1,133 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from clusterapp.config import (
+    GROUP_SIMILARITY_THRESHOLD,
+    NEAR_DUPLICATE_THRESHOLD,
+    VECTOR_FEATURES,
+)
+
+# Character n-gram sizes used for keyword vectors
+NGRAM_SIZES = (3, 4, 5)
+
+# Modifiers that mean exactly the same in a search, mapped to one spelling before vectorizing.
+# Related but distinct intents such as "guide", "ideas" and "tips" stay apart.
+KEYWORD_SYNONYMS = {
+    "top": "best",
+    "greatest": "best",
+    "beginner": "beginners",
+    "reviews": "review",
+    "vs": "versus",
+}
+
+# Lowercase a keyword, fold its synonyms and pad it with spaces, memoized since history is re-vectorized often
+@lru_cache(maxsize=65536)
+def _folded_text(keyword):
+    words = [KEYWORD_SYNONYMS.get(word, word) for word in keyword.lower().split()]
+    return f" {' '.join(words)} "
+
+# Hash every character n-gram of every keyword into (row, feature index) pairs in one pass over a
+# code point array of all keywords, each followed by NUL. A fixed polynomial hash rather than the per-process
+# salted hash(), so scores are the same in every run.
+def _ngram_features(keywords, n_features):
+    texts = [_folded_text(keyword) for keyword in keywords]
+    codes = np.frombuffer("".join(f"{text}\0" for text in texts).encode("utf-32-le"), dtype=np.uint32)
+    codes = codes.astype(np.uint64)
+    lengths = np.fromiter((len(text) + 1 for text in texts), dtype=np.int64, count=len(texts))
+    # The keyword each code point belongs to, with -1 for the NUL after each keyword
+    owners = np.repeat(np.arange(len(texts)), lengths)
+    owners[np.cumsum(lengths) - 1] = -1
+
+    rows, cols = [], []
+    for size in NGRAM_SIZES:
+        starts = np.flatnonzero(owners[:len(owners) - size + 1] >= 0)
+        starts = starts[owners[starts + size - 1] == owners[starts]]
+        hashes = np.zeros(len(starts), dtype=np.uint64)
+        for offset in range(size):
+            hashes = hashes * np.uint64(1000003) + codes[starts + offset]
+        # Mix the bits so the modulo does not just keep the last character
+        hashes ^= hashes >> np.uint64(29)
+        hashes *= np.uint64(0xBF58476D1CE4E5B9)
+        hashes ^= hashes >> np.uint64(32)
+        rows.append(owners[starts])
+        cols.append((hashes % np.uint64(n_features)).astype(np.int64))
+    return np.concatenate(rows), np.concatenate(cols)
+
+# Turn keywords into L2-normalized, TF-IDF weighted hashed character n-gram vectors
+def keyword_vectors(keywords, n_features=VECTOR_FEATURES):
+    keywords = [str(keyword) for keyword in keywords]
+    if not keywords:
+        return np.zeros((0, n_features), dtype=np.float32)
+    rows, cols = _ngram_features(keywords, n_features)
+
+    flat_counts = np.bincount(rows * n_features + cols, minlength=len(keywords) * n_features)
+    vectors = flat_counts.reshape(len(keywords), n_features).astype(np.float32)
+
+    # Down-weight n-grams shared by most keywords, such as the topic itself
+    document_frequency = np.count_nonzero(vectors, axis=0)
+    idf = np.log((1 + len(keywords)) / (1 + document_frequency)) + 1
+    np.log1p(vectors, out=vectors)
+    vectors *= idf.astype(np.float32)
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors /= np.maximum(norms, 1e-12)
+    return vectors
+
+# Find every pair (i < j) whose cosine similarity reaches the threshold, one row batch at a time.
+# Each batch is only compared with itself and later rows, so the work is half a full matrix.
+def similar_pairs(vectors, threshold, batch_size=1024):
+    pair_rows, pair_cols, pair_scores = [], [], []
+    for start in range(0, len(vectors), batch_size):
+        similarities = vectors[start:start + batch_size] @ vectors[start:].T
+        rows, cols = np.nonzero(similarities >= threshold)
+        upper = cols > rows
+        pair_rows.append(rows[upper] + start)
+        pair_cols.append(cols[upper] + start)
+        pair_scores.append(similarities[rows[upper], cols[upper]])
+    if not pair_rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    return np.concatenate(pair_rows), np.concatenate(pair_cols), np.concatenate(pair_scores)
+
+# Label connected components of the similarity graph by their lowest member index
+def component_labels(count, rows, cols):
+    labels = np.arange(count)
+    while True:
+        previous = labels.copy()
+        lowest = np.minimum(labels[rows], labels[cols])
+        np.minimum.at(labels, rows, lowest)
+        np.minimum.at(labels, cols, lowest)
+        # Point every label at its own root so chains collapse quickly
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            return labels
+
+# For each keyword, the index of the first keyword it near-duplicates (its own index if none)
+def near_duplicate_labels(keywords, threshold=NEAR_DUPLICATE_THRESHOLD):
+    keywords = list(keywords)
+    if not keywords:
+        return np.empty(0, dtype=np.int64)
+    rows, cols, _ = similar_pairs(keyword_vectors(keywords), threshold)
+    return component_labels(len(keywords), rows, cols)
+
+# Drop rows whose keyword near-duplicates an earlier row
+def drop_near_duplicates(df, threshold=NEAR_DUPLICATE_THRESHOLD):
+    labels = near_duplicate_labels(df["keyword"].astype(str), threshold)
+    return df[labels == np.arange(len(df))].reset_index(drop=True)
+
+# Group keywords into sub-clusters of similar phrasing, numbered 1..k in order of first appearance
+def group_keywords(keywords, threshold=GROUP_SIMILARITY_THRESHOLD):
+    labels = near_duplicate_labels(keywords, threshold)
+    _, first_seen, group_index = np.unique(labels, return_index=True, return_inverse=True)
+    order = np.argsort(np.argsort(first_seen))
+    return order[group_index] + 1
+
+# List each near-duplicate row next to the earlier row it repeats (columns prefixed "duplicate_of_")
+def near_duplicate_report(df, threshold=NEAR_DUPLICATE_THRESHOLD):
+    df = df.reset_index(drop=True)
+    labels = near_duplicate_labels(df["keyword"].astype(str), threshold)
+    rows = np.flatnonzero(labels != np.arange(len(df)))
+    duplicates = df.iloc[rows].reset_index(drop=True)
+    originals = df.iloc[labels[rows]].reset_index(drop=True).add_prefix("duplicate_of_")
+    return pd.concat([duplicates, originals], axis=1)
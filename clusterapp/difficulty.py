@@ -0,0 +1,42 @@
+# Function to get difficulty-specific parameters.
+# volume_range and competition_range are the numeric bounds of the text above (None means no upper bound).
+def get_difficulty_parameters(difficulty):
+    if difficulty == "Low":
+        return {
+            "description": "keywords with minimal competition that are much easier to rank for",
+            "search_volume": "lower search volume (typically 10-300 monthly searches)",
+            "complexity": "can range from 1-2 words to longer specific phrases",
+            "examples": "short keywords with low competition, specific how-to guides, niche questions, micro-topics",
+            "competition": "low competition score (0-30%), few established websites ranking for these terms",
+            "volume_range": (10, 300),
+            "competition_range": (0, 30),
+            "kd_score": "KD (Keyword Difficulty) score below 30",
+            "serp_features": "fewer SERP features, less established content",
+            "intent": "often highly specific informational or long-tail transactional intent"
+        }
+    elif difficulty == "Medium":
+        return {
+            "description": "moderately competitive terms with decent traffic potential but still attainable",
+            "search_volume": "moderate search volume (typically 300-1,000 monthly searches)",
+            "complexity": "can range from 1-2 words to mid-length focused phrases",
+            "examples": "moderately competitive short keywords, specific questions, comparison posts, focused topic guides",
+            "competition": "medium competition score (30-60%), some established websites but ranking opportunities exist",
+            "volume_range": (300, 1000),
+            "competition_range": (30, 60),
+            "kd_score": "KD (Keyword Difficulty) score between 30-60",
+            "serp_features": "some SERP features, moderate content quality needed",
+            "intent": "mix of informational and commercial intent"
+        }
+    else:  # High
+        return {
+            "description": "highly competitive keywords with strong traffic potential but difficult to rank for",
+            "search_volume": "high search volume (typically 1,000+ monthly searches)",
+            "complexity": "can be short terms (1-2 words) or broader phrases",
+            "examples": "highly competitive short keywords, major topic guides, competitive reviews, popular products or services",
+            "competition": "high competition score (60%+), many established websites with high authority",
+            "volume_range": (1000, None),
+            "competition_range": (60, 100),
+            "kd_score": "KD (Keyword Difficulty) score above 60",
+            "serp_features": "many SERP features, highly optimized content required",
+            "intent": "often commercial or navigational intent with high competition"
+        }
@@ -0,0 +1,11 @@
+# Raised when the LLM response cannot be turned into a keyword table
+class ClusterGenerationError(Exception):
+    pass
+
+# Raised when the provider keeps throttling or failing after every retry
+class ProviderUnavailableError(ClusterGenerationError):
+    pass
+
+# Raised in a caller that waited on an identical in-flight request which failed; the cause is the leader's error
+class SharedRequestError(ClusterGenerationError):
+    pass
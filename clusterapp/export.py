@@ -0,0 +1,82 @@
+import io
+import re
+import zipfile
+
+from clusterapp.generator import number_rows
+
+# Supported export formats and their MIME types
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+BUNDLE_MIME = "application/zip"
+
+# File name for one topic and difficulty, safe to use on any file system and inside a zip
+def export_file_name(topic, difficulty, export_format):
+    safe_topic = re.sub(r"[^\w\-]+", "_", topic).strip("_") or "topic"
+    return f"{safe_topic}_{difficulty.lower()}_difficulty_content_clusters.{export_format}"
+
+# Write a results table to a binary file object in the given format
+def write_frame(df, target, export_format):
+    if export_format == "csv":
+        text = io.TextIOWrapper(target, encoding="utf-8", newline="", write_through=True)
+        df.to_csv(text, index=False)
+        text.detach()
+    elif export_format == "jsonl":
+        text = io.TextIOWrapper(target, encoding="utf-8", write_through=True)
+        df.to_json(text, orient="records", lines=True, force_ascii=False)
+        text.detach()
+    elif export_format == "parquet":
+        df.to_parquet(target, index=False)
+    elif export_format == "xlsx":
+        # Excel has no categorical or Arrow string types
+        df.astype(object).to_excel(target, index=False, sheet_name="Content Clusters")
+    else:
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+# Zip member name not yet in used, numbered "_2", "_3", ... on a clash. Names are compared
+# case-insensitively, since a bundle may be unpacked on a case-insensitive file system.
+def _unique_member_name(name, used):
+    stem, dot, extension = name.rpartition(".")
+    candidate, suffix = name, 1
+    while candidate.lower() in used:
+        suffix += 1
+        candidate = f"{stem}_{suffix}{dot}{extension}"
+    used.add(candidate.lower())
+    return candidate
+
+# Build one table's export payload; meant to run only when a download is requested
+def export_bytes(df, export_format):
+    buffer = io.BytesIO()
+    write_frame(df, buffer, export_format)
+    return buffer.getvalue()
+
+# Write a zip with one file per (topic, difficulty, DataFrame) result. Each member is
+# compressed as it is written, so only one table's payload is held at a time.
+# Topics that sanitize to the same file name ("t 1", "t_1") get numbered members.
+def write_bundle(results, target, export_format="csv"):
+    count = 0
+    used = set()
+    with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_DEFLATED) as bundle:
+        for topic, difficulty, df in results:
+            if "number" not in df.columns:
+                df = number_rows(df.reset_index(drop=True))
+            name = _unique_member_name(export_file_name(topic, difficulty, export_format), used)
+            with bundle.open(name, "w") as member:
+                write_frame(df, member, export_format)
+            count += 1
+    return count
+
+# Build a zip bundle's payload; meant to run only when a download is requested
+def bundle_bytes(results, export_format="csv"):
+    buffer = io.BytesIO()
+    write_bundle(results, buffer, export_format)
+    return buffer.getvalue()
+
+# Flatten {topic: {difficulty: DataFrame}} results into (topic, difficulty, DataFrame) tuples
+def iter_results(results):
+    for topic, difficulties in results.items():
+        for difficulty, df in difficulties.items():
+            yield topic, difficulty, df
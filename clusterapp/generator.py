@@ -0,0 +1,280 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+
+import pandas as pd
+
+from clusterapp.cache import KeywordCache
+from clusterapp.config import (
+    DIFFICULTY_LEVELS,
+    DRILLDOWN_KEYWORD_COUNT,
+    KEYWORD_COUNT,
+    LLM_EXPECTED_COMPLETION_TOKENS,
+    TOP_UP_MAX_ROUNDS,
+)
+from clusterapp.dedupe import drop_near_duplicates
+from clusterapp.exceptions import ClusterGenerationError
+from clusterapp.hedging import HedgeCancelled, hedger
+from clusterapp.llm import LLMSettings, cancel_requests_on, get_llm
+from clusterapp.metrics import message_token_usage, metrics, record_llm_usage, in_current_context, span, traced
+from clusterapp.parsing import KeywordStreamParser, parse_keywords_response, salvage_keywords
+from clusterapp.prompts import build_prompts, build_top_up_prompts, count_tokens
+from clusterapp.ratelimit import rate_limiters
+from clusterapp.scoring import add_metric_columns
+from clusterapp.singleflight import SingleFlight
+from clusterapp.topics import normalize_topic
+
+# Identical generations running at the same time share one LLM call
+generation_flights = SingleFlight()
+
+# Record a call's token usage, counting tokens locally when the response does not report them.
+# Returns the total tokens used, or None if they could not be counted.
+def record_response_usage(model, kind, usage, system_prompt, user_prompt, response_text):
+    if usage is not None:
+        record_llm_usage(model, kind, *usage)
+        return sum(usage)
+    try:
+        prompt_tokens = count_tokens(system_prompt, model) + count_tokens(user_prompt, model)
+        completion_tokens = count_tokens(response_text, model)
+    except Exception:
+        # Without a tokenizer the call is still counted, just without tokens
+        record_llm_usage(model, kind, None, None)
+        return None
+    record_llm_usage(model, kind, prompt_tokens, completion_tokens, estimated=True)
+    return prompt_tokens + completion_tokens
+
+# Call the LLM and parse its response into a keyword DataFrame, streaming rows to on_keyword if given.
+# Returns (df, salvaged) where salvaged means only the complete objects of a broken response were kept.
+# With hedging on, a slow call races an identical second request and the first complete parse wins.
+def request_content_clusters(system_prompt, user_prompt, on_keyword=None, llm_settings=None, kind="initial"):
+    # LangChain is imported lazily so importing this package stays cheap
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    # Reuse the pooled client for these settings
+    llm_settings = llm_settings or LLMSettings()
+    llm = get_llm(llm_settings)
+
+    # Call the LLM
+    messages = [
+        SystemMessage(content=system_prompt),
+        HumanMessage(content=user_prompt)
+    ]
+
+    # Set once a streamed reply showed its first chunk
+    shown = []
+
+    # Hedged attempts are streamed too: a whole reply is only stopped after it was generated and paid
+    # for, while a stream stops at the loser's next chunk or when its response is closed
+    def call_llm(cancelled=None):
+        with span("llm", kind=kind):
+            if on_keyword is None and not llm_settings.hedge:
+                response = llm.invoke(messages)
+                response_text = response.content
+                usage = message_token_usage(response)
+            else:
+                parser = KeywordStreamParser()
+                chunks = []
+                usage = None
+                stream = llm.stream(messages)
+                try:
+                    for chunk in stream:
+                        if cancelled is not None and cancelled.is_set():
+                            break
+                        chunks.append(chunk.content)
+                        # Providers that report usage on a stream do so on its last chunk
+                        usage = message_token_usage(chunk) or usage
+                        if on_keyword is not None:
+                            shown.append(True)
+                            for keyword in parser.feed(chunk.content):
+                                on_keyword(keyword)
+                except Exception:
+                    if cancelled is None or not cancelled.is_set():
+                        raise
+                finally:
+                    stream.close()
+                response_text = "".join(chunks)
+                if cancelled is not None and cancelled.is_set():
+                    # Count what the loser generated before it stopped
+                    raise HedgeCancelled(record_response_usage(
+                        llm_settings.model, kind, usage, system_prompt, user_prompt, response_text
+                    ))
+        tokens_used = record_response_usage(
+            llm_settings.model, kind, usage, system_prompt, user_prompt, response_text
+        )
+        return response_text, tokens_used
+
+    # Every call goes through the model's shared limiter. A stream that already showed
+    # keywords is not retried, so the same rows are never shown twice, and a hedged
+    # attempt that lost the race is not retried either.
+    estimated_tokens = (len(system_prompt) + len(user_prompt)) // 4 + LLM_EXPECTED_COMPLETION_TOKENS
+    limiter = rate_limiters.get(llm_settings.model)
+
+    def attempt(cancelled=None):
+        with cancel_requests_on(cancelled):
+            response_text = limiter.call(
+                partial(call_llm, cancelled), estimated_tokens, cancelled=cancelled,
+                can_retry=lambda: not shown and not (cancelled is not None and cancelled.is_set())
+            )
+        try:
+            return parse_keywords_response(response_text), False
+        except ClusterGenerationError:
+            metrics.increment("clusterapp_salvaged_responses_total")
+            return salvage_keywords(response_text), True
+
+    # Keywords shown as they arrive cannot be raced, so only replies returned whole are hedged
+    if on_keyword is not None:
+        return attempt()
+    if llm_settings.hedge:
+        return hedger.call(
+            (llm_settings.model, kind), attempt, is_valid=lambda result: result[0] is not None and not result[1]
+        )
+    # Unhedged replies still teach the hedger this model's latencies
+    return hedger.timed((llm_settings.model, kind), attempt)
+
+# Ask only for the keywords still missing, excluding those we already have, for a capped number of rounds
+def top_up_keywords(topic, difficulty, df, llm_settings=None, max_rounds=TOP_UP_MAX_ROUNDS):
+    for _ in range(max_rounds):
+        missing = KEYWORD_COUNT - len(df)
+        if missing <= 0:
+            break
+        system_prompt, user_prompt = build_top_up_prompts(
+            topic, difficulty, df["keyword"].tolist(), missing
+        )
+        try:
+            extra, _ = request_content_clusters(
+                system_prompt, user_prompt, llm_settings=llm_settings, kind="top_up"
+            )
+        except Exception:
+            # A failed top-up never costs us the keywords we already have
+            break
+        if extra is None or extra.empty:
+            break
+        with span("dedupe"):
+            merged = drop_near_duplicates(pd.concat([df, extra], ignore_index=True))
+        if len(merged) == len(df):
+            # The model only repeated existing keywords; another round is unlikely to help
+            break
+        df = merged
+    return df.iloc[:KEYWORD_COUNT]
+
+# Request a full keyword set, topping up short or salvaged answers instead of regenerating them.
+# With a parent_path, request the smaller set of sub-clusters of topic below that path instead.
+def request_keyword_set(topic, difficulty, on_keyword=None, llm_settings=None, parent_path=()):
+    with span("prompt_build"):
+        system_prompt, user_prompt = build_prompts(topic, difficulty, parent_path)
+    df, _ = request_content_clusters(
+        system_prompt, user_prompt, on_keyword=on_keyword, llm_settings=llm_settings
+    )
+    if df is None or "keyword" not in df.columns:
+        return df
+    with span("dedupe"):
+        df = drop_near_duplicates(df)
+    if parent_path:
+        # Replies are only capped at the full KEYWORD_COUNT while parsing
+        return df.iloc[:DRILLDOWN_KEYWORD_COUNT]
+    if len(df) < KEYWORD_COUNT:
+        with span("top_up", missing=KEYWORD_COUNT - len(df)):
+            df = top_up_keywords(topic, difficulty, df, llm_settings=llm_settings)
+    return df
+
+# Generate a keyword set and store it in the cache (if given)
+def generate_and_store(topic, difficulty, cache, cache_key, on_keyword, llm_settings, parent_path=()):
+    df = request_keyword_set(
+        topic, difficulty, on_keyword=on_keyword, llm_settings=llm_settings, parent_path=parent_path
+    )
+    if df is not None and cache is not None:
+        with span("cache_store"):
+            cache.put(cache_key, topic, difficulty, df)
+    return df
+
+# Generate a keyword set, or wait for the identical generation already in flight and share its result.
+# If that generation fails, every waiting caller raises a SharedRequestError caused by its error.
+def coalesced_keyword_set(topic, difficulty, cache, cache_key, on_keyword, llm_settings, parent_path=()):
+    flight_key = (tuple(normalize_topic(node) for node in (*parent_path, topic)), difficulty, llm_settings)
+    df, shared = generation_flights.do(
+        flight_key, generate_and_store, topic, difficulty, cache, cache_key, on_keyword, llm_settings, parent_path
+    )
+    if shared:
+        metrics.increment("clusterapp_coalesced_requests_total")
+        if df is not None:
+            df = df.copy()
+    return df
+
+# Fetch the keyword DataFrame from the cache (if given) or the LLM; safe to call from worker threads.
+# Each call is traced, or becomes a span of the caller's trace if one is active.
+# A parent_path (root topic, ..., parent keyword) fetches sub-clusters of topic in that context.
+def fetch_content_clusters(
+    topic, difficulty, cache=None, force_refresh=False, on_keyword=None, llm_settings=None, parent_path=()
+):
+    llm_settings = llm_settings or LLMSettings()
+    parent_path = tuple(parent_path)
+    with traced(
+        "fetch_content_clusters", topic=" > ".join((*parent_path, topic)), difficulty=difficulty,
+        model=llm_settings.model
+    ):
+        if cache is None:
+            return coalesced_keyword_set(topic, difficulty, None, None, on_keyword, llm_settings, parent_path)
+
+        # Key the cache on the normalized topic (and path) so trivial variants share an entry
+        with span("prompt_build"):
+            cache_key = KeywordCache.make_key(
+                topic, difficulty, llm_settings.model, *build_prompts(
+                    normalize_topic(topic), difficulty, tuple(normalize_topic(node) for node in parent_path)
+                )
+            )
+        df = None
+        if not force_refresh:
+            with span("cache_lookup"):
+                df = cache.get(cache_key)
+            metrics.increment("clusterapp_cache_requests_total", result="miss" if df is None else "hit")
+        if df is None:
+            df = coalesced_keyword_set(topic, difficulty, cache, cache_key, on_keyword, llm_settings, parent_path)
+        return df
+
+# Add a "number" column counting rows from 1
+def number_rows(df):
+    # Add a numbered index starting from 1 instead of 0, on a copy since results can be shared
+    df = df.reset_index(drop=True)
+    df.index = df.index + 1
+
+    # Reset index to create a column with numbering starting from 1
+    return df.reset_index().rename(columns={"index": "number"})
+
+# IMPROVED Function to generate content clusters with more appropriate keyword selection
+def generate_content_clusters(
+    topic, difficulty, cache=None, force_refresh=False, on_keyword=None, llm_settings=None
+):
+    df = fetch_content_clusters(
+        topic,
+        difficulty,
+        cache=cache,
+        force_refresh=force_refresh,
+        on_keyword=on_keyword,
+        llm_settings=llm_settings
+    )
+    if df is None:
+        return None
+    return add_metric_columns(number_rows(df), difficulty)
+
+# Generate every difficulty level (or only the given levels) concurrently, yielding (difficulty, df, error)
+# as each finishes. Closing the generator early does not wait for the levels still running.
+def generate_all_difficulties(topic, cache=None, force_refresh=False, llm_settings=None, levels=DIFFICULTY_LEVELS):
+    executor = ThreadPoolExecutor(max_workers=len(levels))
+    try:
+        futures = {
+            # Workers run in a copy of this context so their spans join the caller's trace
+            executor.submit(
+                in_current_context(fetch_content_clusters), topic, level, cache, force_refresh,
+                llm_settings=llm_settings
+            ): level
+            for level in levels
+        }
+        for future in as_completed(futures):
+            level = futures[future]
+            try:
+                df = future.result()
+            except Exception as e:
+                yield level, None, e
+                continue
+            yield level, df, None
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,168 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from clusterapp.config import (
+    LLM_HEDGE_HISTORY_SIZE,
+    LLM_HEDGE_MAX_RATIO,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_PERCENTILE,
+)
+from clusterapp.metrics import in_current_context, metrics
+
+# Raised by an attempt that notices the other attempt already won, with the tokens it used
+# before it stopped if they are known
+class HedgeCancelled(Exception):
+    def __init__(self, tokens_used=None):
+        super().__init__("The other attempt already won")
+        self.tokens_used = tokens_used
+
+# Cancellation signal shared by the attempts of one hedged call. Callbacks registered with on_cancel
+# run once when it is set, e.g. to close the losing attempt's streamed HTTP response, which ends
+# its generation instead of paying for the rest of it.
+class CancelToken:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._set = False
+        self._callbacks = []
+
+    def is_set(self):
+        return self._set
+
+    def set(self):
+        with self._lock:
+            if self._set:
+                return
+            self._set = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    # Run callback on cancellation, right away if already cancelled. Returns a function that
+    # unregisters it, for attempts that finish first.
+    def on_cancel(self, callback):
+        with self._lock:
+            if not self._set:
+                self._callbacks.append(callback)
+                return lambda: self._discard(callback)
+        callback()
+        return lambda: None
+
+    def _discard(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+# Process-wide hedging of slow calls. A call still running after the given percentile of recent
+# latencies for its key gets an identical second attempt, and the first valid result wins.
+# Hedges are capped at max_ratio of all calls, so a slow provider is not sent twice the load.
+class Hedger:
+    def __init__(
+        self,
+        percentile=LLM_HEDGE_PERCENTILE,
+        max_ratio=LLM_HEDGE_MAX_RATIO,
+        min_samples=LLM_HEDGE_MIN_SAMPLES,
+        history_size=LLM_HEDGE_HISTORY_SIZE,
+    ):
+        self.percentile = percentile
+        self.max_ratio = max_ratio
+        self.min_samples = min_samples
+        self.history_size = history_size
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            # key -> latencies in seconds of recent successful attempts, oldest first
+            self._latencies = {}
+            self.calls = 0
+            self.hedged = 0
+            self.hedge_wins = 0
+
+    def record_latency(self, key, seconds):
+        with self._lock:
+            history = self._latencies.get(key)
+            if history is None:
+                history = self._latencies[key] = deque(maxlen=self.history_size)
+            history.append(seconds)
+
+    # Seconds to wait before hedging a call for key, or None until enough latencies were seen
+    def hedge_delay(self, key):
+        with self._lock:
+            history = sorted(self._latencies.get(key, ()))
+        if len(history) < max(self.min_samples, 1):
+            return None
+        return history[min(len(history) - 1, int(len(history) * self.percentile / 100))]
+
+    # Take one hedge from the budget if hedged calls stay within max_ratio of all calls
+    def _reserve_hedge(self):
+        with self._lock:
+            if self.hedged + 1 > self.max_ratio * self.calls:
+                return False
+            self.hedged += 1
+            return True
+
+    def _timed(self, key, attempt, cancelled):
+        if cancelled.is_set():
+            raise HedgeCancelled()
+        started = time.perf_counter()
+        result = attempt(cancelled)
+        self.record_latency(key, time.perf_counter() - started)
+        return result
+
+    # Run attempt(cancelled) without hedging, only recording its latency so hedging starts warm
+    def timed(self, key, attempt):
+        return self._timed(key, attempt, CancelToken())
+
+    # Run attempt(cancelled), hedging it with a second identical attempt if it is slow.
+    # The first result that is_valid accepts wins and the CancelToken cancelled is set for the other
+    # attempt: its on_cancel callbacks close its response, and it stops at its next check.
+    # If neither result is valid, the first attempt's result or exception is returned.
+    def call(self, key, attempt, is_valid=None):
+        with self._lock:
+            self.calls += 1
+        delay = self.hedge_delay(key)
+        cancelled = CancelToken()
+        if delay is None:
+            return self._timed(key, attempt, cancelled)
+        executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hedge")
+        try:
+            # Attempts run in a copy of this context so their spans join the caller's trace
+            primary = executor.submit(in_current_context(self._timed), key, attempt, cancelled)
+            try:
+                return primary.result(timeout=delay)
+            except FutureTimeoutError:
+                pass
+            if not self._reserve_hedge():
+                return primary.result()
+
+            metrics.increment("clusterapp_hedged_requests_total")
+            hedge = executor.submit(in_current_context(self._timed), key, attempt, cancelled)
+            pending = {primary, hedge}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None and (is_valid is None or is_valid(future.result())):
+                        if future is hedge:
+                            with self._lock:
+                                self.hedge_wins += 1
+                            metrics.increment("clusterapp_hedge_wins_total")
+                        return future.result()
+            return primary.result()
+        finally:
+            cancelled.set()
+            # Never wait for the losing attempt
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "hedge_rate": self.hedged / self.calls if self.calls else 0.0,
+            }
+
+hedger = Hedger()
@@ -0,0 +1,131 @@
+import contextvars
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from clusterapp.config import (
+    LLM_HEDGE_ENABLED,
+    LLM_JSON_MODE,
+    LLM_MAX_CONNECTIONS,
+    LLM_TIMEOUT_SECONDS,
+    MODEL_NAME,
+    MODEL_TEMPERATURE,
+)
+
+# Settings that identify one shared LLM client
+@dataclass(frozen=True)
+class LLMSettings:
+    model: str = MODEL_NAME
+    temperature: float = MODEL_TEMPERATURE
+    max_connections: int = LLM_MAX_CONNECTIONS
+    timeout: float = LLM_TIMEOUT_SECONDS
+    json_mode: bool = LLM_JSON_MODE
+    # Hedge slow calls with a second identical request (see clusterapp.hedging)
+    hedge: bool = LLM_HEDGE_ENABLED
+
+    # The settings that change what the model writes, to tell apart results generated with them
+    @property
+    def generation_key(self):
+        return self.model, self.temperature, self.json_mode
+
+# Cancellation token of the hedged attempt running in this context, if any (see clusterapp.hedging)
+_cancel_token = contextvars.ContextVar("clusterapp_cancel_token", default=None)
+
+# Close every HTTP response received inside this block as soon as cancelled is set, so a hedged
+# attempt that lost the race frees its pooled connection and, as hedged replies are streamed,
+# the provider stops generating it
+@contextmanager
+def cancel_requests_on(cancelled):
+    token = _cancel_token.set(cancelled)
+    try:
+        yield
+    finally:
+        _cancel_token.reset(token)
+
+# Process-wide registry handing out one pooled ChatOpenAI client per settings combination
+class LLMClientRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+        self.requests = 0
+        self.connections_opened = 0
+
+    def get(self, settings=None):
+        settings = settings or LLMSettings()
+        with self._lock:
+            llm = self._clients.get(settings)
+            if llm is None:
+                llm = self._create(settings)
+                self._clients[settings] = llm
+            return llm
+
+    # Use the given client for these settings, e.g. a local stand-in for benchmarks
+    def register(self, settings, llm):
+        with self._lock:
+            self._clients[settings] = llm
+
+    def _create(self, settings):
+        # Imported lazily so importing the package stays cheap
+        import httpx
+        from langchain_openai import ChatOpenAI
+
+        http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=settings.max_connections,
+                max_keepalive_connections=settings.max_connections
+            ),
+            timeout=settings.timeout,
+            event_hooks={"request": [self._on_request], "response": [self._on_response]}
+        )
+        # JSON mode constrains the reply to one valid JSON object
+        model_kwargs = {"response_format": {"type": "json_object"}} if settings.json_mode else {}
+        return ChatOpenAI(
+            temperature=settings.temperature,
+            model=settings.model,
+            request_timeout=settings.timeout,
+            http_client=http_client,
+            model_kwargs=model_kwargs,
+            # Retries are handled by the shared rate limiter, which also backs off on 429s
+            max_retries=0
+        )
+
+    # Count every request and, through the httpcore trace hook, every new TCP connection
+    def _on_request(self, request):
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self._on_trace
+
+    # Runs once the response headers arrived, before the body is read
+    def _on_response(self, response):
+        cancelled = _cancel_token.get()
+        if cancelled is not None:
+            cancelled.on_cancel(response.close)
+
+    def _on_trace(self, event_name, info):
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections_opened += 1
+
+    def stats(self):
+        with self._lock:
+            reused = max(self.requests - self.connections_opened, 0)
+            return {
+                "clients": len(self._clients),
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "connection_reuse_rate": reused / self.requests if self.requests else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            for llm in self._clients.values():
+                client = getattr(llm, "http_client", None)
+                if client is not None:
+                    client.close()
+            self._clients = {}
+
+llm_registry = LLMClientRegistry()
+
+# Return the shared client for these settings, creating it on first use
+def get_llm(settings=None):
+    return llm_registry.get(settings)
@@ -0,0 +1,267 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+from clusterapp.config import METRICS_FILE_PATH, MODEL_PRICES_PER_MILLION, TRACE_HISTORY_SIZE
+
+# Upper bounds (seconds) of the duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Help text of every metric, in Prometheus exposition order
+METRIC_HELP = {
+    "clusterapp_requests_total": ("counter", "Traced generation requests by request name and status."),
+    "clusterapp_request_duration_seconds": ("histogram", "Duration of traced generation requests."),
+    "clusterapp_stage_duration_seconds": ("histogram", "Duration of each stage of a generation request."),
+    "clusterapp_llm_calls_total": ("counter", "LLM calls by model and kind."),
+    "clusterapp_llm_tokens_total": ("counter", "LLM tokens by model and direction."),
+    "clusterapp_llm_cost_usd_total": ("counter", "Estimated LLM cost in US dollars by model."),
+    "clusterapp_cache_requests_total": ("counter", "Response cache lookups by result."),
+    "clusterapp_retries_total": ("counter", "Bulk generation retries."),
+    "clusterapp_rate_limit_throttled_total": ("counter", "LLM calls rejected by the provider with HTTP 429."),
+    "clusterapp_rate_limit_retries_total": ("counter", "LLM calls retried after throttling or a transient error."),
+    "clusterapp_rate_limit_wait_seconds": ("histogram", "Time spent waiting for the request and token budgets."),
+    "clusterapp_coalesced_requests_total": ("counter", "Requests that shared an identical in-flight generation."),
+    "clusterapp_hedged_requests_total": ("counter", "Slow LLM calls that were sent a second, hedging request."),
+    "clusterapp_hedge_wins_total": ("counter", "Hedged LLM calls where the hedging request answered first."),
+    "clusterapp_salvaged_responses_total": ("counter", "Malformed responses whose complete keywords were kept."),
+}
+
+# Every JSON trace record is logged here; see enable_trace_log
+trace_logger = logging.getLogger("clusterapp.trace")
+
+# The trace the current thread or task is working on, if any
+_current_trace = contextvars.ContextVar("clusterapp_trace", default=None)
+
+# Spans of one traced request. Worker threads started with a copy of the context share it.
+class Trace:
+    def __init__(self, name, attributes):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attributes = attributes
+        self.started = time.perf_counter()
+        self.timestamp = time.time()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add_span(self, stage, started, duration, labels):
+        with self._lock:
+            self.spans.append({
+                "stage": stage,
+                "start_ms": round((started - self.started) * 1000, 2),
+                "duration_ms": round(duration * 1000, 2),
+                **labels,
+            })
+
+    def to_record(self, duration, status):
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "timestamp": self.timestamp,
+            "status": status,
+            "duration_ms": round(duration * 1000, 2),
+            **self.attributes,
+            "spans": spans,
+        }
+
+# Process-wide counters, duration histograms and recent traces
+class MetricsRegistry:
+    def __init__(self, history_size=TRACE_HISTORY_SIZE, metrics_file_path=METRICS_FILE_PATH):
+        self._lock = threading.Lock()
+        self.history_size = history_size
+        self.metrics_file_path = metrics_file_path
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            # name -> {sorted label items: value}
+            self._counters = {}
+            # name -> {sorted label items: [count per bucket..., +Inf count, sum]}
+            self._histograms = {}
+            self.traces = deque(maxlen=self.history_size)
+
+    def increment(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            values = series.setdefault(key, [0] * (len(DURATION_BUCKETS) + 1) + [0.0])
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    values[i] += 1
+            values[len(DURATION_BUCKETS)] += 1
+            values[-1] += seconds
+
+    # Sum of a counter over all its label sets, or only those matching the given labels
+    def counter_total(self, name, **labels):
+        with self._lock:
+            return sum(
+                value for key, value in self._counters.get(name, {}).items()
+                if all(item in key for item in labels.items())
+            )
+
+    # Count, mean, p50 and p95 duration of every stage over the recent traces
+    def stage_summary(self):
+        with self._lock:
+            traces = list(self.traces)
+        durations = {}
+        for record in traces:
+            for span in record["spans"]:
+                durations.setdefault(span["stage"], []).append(span["duration_ms"])
+        summary = []
+        for stage, values in durations.items():
+            values.sort()
+            summary.append({
+                "stage": stage,
+                "count": len(values),
+                "mean_ms": round(sum(values) / len(values), 2),
+                "p50_ms": values[(len(values) - 1) // 2],
+                "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))],
+            })
+        return summary
+
+    def recent_traces(self):
+        with self._lock:
+            return list(self.traces)
+
+    # Recent traces as JSON lines, one record per line
+    def traces_jsonl(self):
+        return "".join(json.dumps(record, default=str) + "\n" for record in self.recent_traces())
+
+    def record_trace(self, record):
+        with self._lock:
+            self.traces.append(record)
+        trace_logger.info(json.dumps(record, default=str))
+        if self.metrics_file_path:
+            self.write_prometheus(self.metrics_file_path)
+
+    # All metrics in the Prometheus text exposition format
+    def render_prometheus(self):
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {name: {key: list(values) for key, values in series.items()}
+                          for name, series in self._histograms.items()}
+        lines = []
+        for name, (metric_type, help_text) in METRIC_HELP.items():
+            series = counters.get(name) if metric_type == "counter" else histograms.get(name)
+            if not series:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for key, value in sorted(series.items()):
+                if metric_type == "counter":
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+                    continue
+                for bound, count in zip(DURATION_BUCKETS + ("+Inf",), value):
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', str(bound)),))} {count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(value[-1])}")
+                lines.append(f"{name}_count{_format_labels(key)} {value[len(DURATION_BUCKETS)]}")
+        return "\n".join(lines) + "\n"
+
+    # Write the metrics file atomically, so a collector never reads a half-written file
+    def write_prometheus(self, path):
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w") as metrics_file:
+            metrics_file.write(self.render_prometheus())
+        os.replace(temp_path, path)
+
+def _format_labels(key):
+    if not key:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in key) + "}"
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_value(value):
+    return f"{value:.6f}".rstrip("0").rstrip(".") if isinstance(value, float) else str(value)
+
+metrics = MetricsRegistry()
+
+# Time one stage of the current request, recording it in the stage histogram and the active trace
+@contextmanager
+def span(stage, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started
+        metrics.observe("clusterapp_stage_duration_seconds", duration, stage=stage)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_span(stage, started, duration, labels)
+
+# Trace a request from start to finish, logging it as one JSON record with its spans.
+# Inside an already active trace this is just another span of that trace.
+@contextmanager
+def traced(name, **attributes):
+    if _current_trace.get() is not None:
+        with span(name, **attributes):
+            yield
+        return
+
+    trace = Trace(name, attributes)
+    token = _current_trace.set(trace)
+    status = "ok"
+    try:
+        yield trace
+    except BaseException as e:
+        status = type(e).__name__
+        raise
+    finally:
+        _current_trace.reset(token)
+        duration = time.perf_counter() - trace.started
+        metrics.increment("clusterapp_requests_total", request=name, status=status)
+        metrics.observe("clusterapp_request_duration_seconds", duration, request=name)
+        metrics.record_trace(trace.to_record(duration, status))
+
+# Bind a function to a copy of the caller's context, so spans it records in a worker thread join the caller's trace
+def in_current_context(function):
+    return functools.partial(contextvars.copy_context().run, function)
+
+# Prompt and completion tokens reported with an LLM message, or None if it carries no usage
+def message_token_usage(message):
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage")
+    if token_usage:
+        return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0)
+    return None
+
+# Count an LLM call with its tokens and estimated cost (tokens may be None when unknown)
+def record_llm_usage(model, kind, prompt_tokens, completion_tokens, estimated=False):
+    metrics.increment("clusterapp_llm_calls_total", model=model, kind=kind)
+    if prompt_tokens is None:
+        return
+    source = "estimated" if estimated else "reported"
+    metrics.increment("clusterapp_llm_tokens_total", prompt_tokens, model=model, direction="prompt", source=source)
+    metrics.increment(
+        "clusterapp_llm_tokens_total", completion_tokens, model=model, direction="completion", source=source
+    )
+    prices = MODEL_PRICES_PER_MILLION.get(model)
+    if prices is not None:
+        cost = (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+        metrics.increment("clusterapp_llm_cost_usd_total", cost, model=model)
+
+# Append every trace to a JSON lines file
+def enable_trace_log(path):
+    if any(getattr(handler, "baseFilename", None) == os.path.abspath(path) for handler in trace_logger.handlers):
+        return
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    trace_logger.addHandler(handler)
+    trace_logger.setLevel(logging.INFO)
@@ -0,0 +1,119 @@
+import json
+import re
+
+import pandas as pd
+
+from clusterapp.config import KEYWORD_COUNT
+from clusterapp.exceptions import ClusterGenerationError
+from clusterapp.metrics import span
+
+# Matches a comma directly before a closing brace or bracket
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+# Load JSON, retrying once with trailing commas removed
+def loads_tolerant(text):
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return json.loads(TRAILING_COMMA.sub(r"\1", text))
+
+# Incrementally parse a streamed response, returning each keyword object once it is complete
+class KeywordStreamParser:
+    def __init__(self):
+        self.buffer = ""
+        self.position = 0
+        self.in_array = False
+        self.finished = False
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.object_start = None
+
+    def feed(self, text):
+        self.buffer += text
+        completed = []
+        
+        # Wait for the opening bracket of the "keywords" array
+        if not self.in_array:
+            key_index = self.buffer.find('"keywords"')
+            if key_index < 0:
+                return completed
+            array_index = self.buffer.find('[', key_index)
+            if array_index < 0:
+                return completed
+            self.in_array = True
+            self.position = array_index + 1
+        
+        while self.position < len(self.buffer) and not self.finished:
+            char = self.buffer[self.position]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == '{':
+                if self.depth == 0:
+                    self.object_start = self.position
+                self.depth += 1
+            elif char == '}':
+                self.depth -= 1
+                if self.depth == 0 and self.object_start is not None:
+                    try:
+                        item = loads_tolerant(self.buffer[self.object_start:self.position + 1])
+                    except json.JSONDecodeError:
+                        item = None
+                    if isinstance(item, dict) and item.get("keyword"):
+                        completed.append(item)
+                    self.object_start = None
+            elif char == ']' and self.depth == 0:
+                self.finished = True
+            self.position += 1
+        return completed
+
+# Parse the full response text into a keyword DataFrame
+def parse_keywords_response(response_text):
+    # Parse the JSON response with improved handling
+    try:
+        # Look for JSON content within the response
+        json_start = response_text.find('{')
+        json_end = response_text.rfind('}') + 1
+        if json_start >= 0 and json_end > json_start:
+            json_str = response_text[json_start:json_end]
+            with span("json_extraction"):
+                result = loads_tolerant(json_str)
+        else:
+            # Fallback if no JSON found
+            raise ClusterGenerationError("The API response didn't contain properly formatted JSON data.")
+    except json.JSONDecodeError:
+        raise ClusterGenerationError("Could not parse the API response as JSON.")
+
+    # Convert to DataFrame with exact count enforcement
+    if 'keywords' in result:
+        return keywords_to_dataframe(result['keywords'])
+    return None
+
+# Salvage every complete keyword object from a truncated or malformed response
+def salvage_keywords(response_text):
+    with span("json_extraction", salvage=True):
+        keywords = KeywordStreamParser().feed(response_text)
+    if not keywords:
+        raise ClusterGenerationError("Could not parse the API response as JSON.")
+    return keywords_to_dataframe(keywords)
+
+# Build the keyword DataFrame, keeping at most KEYWORD_COUNT rows
+def keywords_to_dataframe(keywords):
+    with span("dataframe_build"):
+        df = pd.DataFrame(keywords)
+
+    # ENSURE EXACTLY KEYWORD_COUNT KEYWORDS
+    if len(df) > KEYWORD_COUNT:
+        df = df.iloc[:KEYWORD_COUNT]  # Take only the first KEYWORD_COUNT
+    elif len(df) < KEYWORD_COUNT:
+        # Short answers are topped up by the generator with follow-up requests
+        pass
+
+    return df.reset_index(drop=True)
@@ -0,0 +1,127 @@
+from functools import lru_cache
+
+from clusterapp.config import DIFFICULTY_LEVELS, DRILLDOWN_KEYWORD_COUNT, KEYWORD_COUNT, MODEL_NAME
+from clusterapp.difficulty import get_difficulty_parameters
+
+# Topic-independent system prompt for a difficulty level. It is identical for every topic,
+# so it goes first and providers can reuse their cached prefix across requests.
+@lru_cache(maxsize=None)
+def build_system_prompt(difficulty):
+    # Get difficulty-specific parameters
+    difficulty_params = get_difficulty_parameters(difficulty)
+    level = difficulty.upper()
+
+    return f"""Role: You are an experienced SEO specialist and content strategist with expertise in keyword difficulty analysis.
+Task: Generate EXACTLY {KEYWORD_COUNT} highly relevant content cluster keywords at {level} difficulty for the topic named in the user message, written [topic] below.
+
+DETAILED SEO KEYWORD DIFFICULTY CRITERIA FOR {level} DIFFICULTY KEYWORDS:
+- Description: {difficulty_params["description"]}
+- Search Volume: {difficulty_params["search_volume"]}
+- Word Count/Format: {difficulty_params["complexity"]}
+- Competition Level: {difficulty_params["competition"]}
+- Keyword Difficulty Score: {difficulty_params["kd_score"]}
+- SERP Features: {difficulty_params["serp_features"]}
+- User Intent: {difficulty_params["intent"]}
+- Examples: {difficulty_params["examples"]}
+
+DIFFICULTY GUIDANCE WITH EXAMPLES (only the {level} line applies to this request):
+- LOW: Long-tail, specific phrases with clear intent but lower search volume (e.g., "[topic] for side sleepers with back pain", "affordable [topic] for small apartments")
+- MEDIUM: Mid-length phrases with moderate competition and search volume (e.g., "best [topic] brands", "[topic] vs traditional", "affordable [topic]")
+- HIGH: Short, competitive terms with high search volume (e.g., "[topic]", "buy [topic]", "[topic] reviews")
+
+Process:
+1. Generate EXACTLY {KEYWORD_COUNT} keywords for [topic] that are STRICTLY {level} difficulty level.
+2. Double-check each keyword against ALL criteria above to ensure it truly fits the {difficulty} difficulty profile.
+3. Each keyword MUST include [topic] or a very close variant.
+4. The keywords should be:
+   a. Genuinely popular and searched (not fabricated terms)
+   b. Directly relevant to [topic]
+   c. Diverse to cover different aspects of the topic
+   d. Suitable for creating multiple content pieces
+
+IMPORTANT: Your goal is to generate THE MOST REALISTIC AND ACCURATE {level} difficulty keywords for [topic] that SEO professionals would actually target, not to artificially create unique terms.
+
+FORMAT OUTPUT JSON:
+{{
+    "keywords": [
+        {{
+            "keyword": "Example {difficulty} Difficulty Keyword",
+            "difficulty_level": "{difficulty}",
+            "search_volume": "Estimated volume of XXX-XXX searches per month",
+            "competition_level": "XX% - {difficulty} competition",
+            "explanation": "Detailed explanation of why this is a {difficulty.lower()} difficulty keyword with specific SEO metrics",
+            "article_idea_1": "Specific title and brief description of a potential article",
+            "article_idea_2": "Specific title and brief description of another potential article"
+        }},
+        ... ({KEYWORD_COUNT - 1} more entries for a total of EXACTLY {KEYWORD_COUNT})
+    ]
+}}
+
+FINAL VALIDATION:
+1. Count your keywords to confirm you have EXACTLY {KEYWORD_COUNT} entries
+2. Review your final list and REMOVE any keywords that don't properly match the {difficulty} difficulty criteria
+3. If you had to remove any keywords that didn't meet the criteria, replace them with new valid keywords to maintain EXACTLY {KEYWORD_COUNT} total."""
+
+# Short topic-specific user prompt sent after the static system prompt
+def build_user_prompt(topic, difficulty):
+    return (
+        f'Topic: "{topic}"\n'
+        f"Generate EXACTLY {KEYWORD_COUNT} {difficulty.upper()} difficulty content cluster keywords for this topic "
+        f"with detailed SEO metrics for each, focusing on being realistic and accurate for the {difficulty} difficulty level."
+    )
+
+# Short user prompt asking for sub-clusters of the last keyword in a path, with the path above it as context
+def build_drilldown_user_prompt(path, difficulty, count=DRILLDOWN_KEYWORD_COUNT):
+    context = " > ".join(f'"{node}"' for node in path)
+    return (
+        f'Topic: "{path[-1]}"\n'
+        f"This topic is a keyword inside the content cluster path {context}. "
+        f"Instead of {KEYWORD_COUNT}, generate EXACTLY {count} {difficulty.upper()} difficulty keywords "
+        f"that break this topic down into narrower sub-topics within that context, in the same JSON format. "
+        f"Do not repeat any keyword from the path."
+    )
+
+# Build the system and user prompts for a topic and difficulty, or for a drill-down below parent_path
+def build_prompts(topic, difficulty, parent_path=()):
+    if parent_path:
+        return build_system_prompt(difficulty), build_drilldown_user_prompt((*parent_path, topic), difficulty)
+    return build_system_prompt(difficulty), build_user_prompt(topic, difficulty)
+
+# Build prompts asking only for the keywords still missing, reusing the static system prompt
+def build_top_up_prompts(topic, difficulty, existing_keywords, count):
+    existing = "\n".join(f"- {keyword}" for keyword in existing_keywords)
+    user_prompt = (
+        f'Topic: "{topic}"\n'
+        f"This is a follow-up request. Instead of {KEYWORD_COUNT}, generate EXACTLY {count} additional "
+        f"{difficulty.upper()} difficulty content cluster keywords for this topic in the same JSON format.\n"
+        f"Do not repeat or closely rephrase any of these existing keywords:\n{existing}"
+    )
+    return build_system_prompt(difficulty), user_prompt
+
+# Load the model's tokenizer once; tiktoken is imported lazily
+@lru_cache(maxsize=None)
+def _get_encoding(model):
+    import tiktoken
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+# Count tokens locally with the model's tokenizer
+def count_tokens(text, model=MODEL_NAME):
+    return len(_get_encoding(model).encode(text))
+
+# Report the input token count of every difficulty's prompt template
+def prompt_token_report(model=MODEL_NAME, sample_topic="organic gardening"):
+    report = {}
+    for level in DIFFICULTY_LEVELS:
+        system_prompt, user_prompt = build_prompts(sample_topic, level)
+        system_tokens = count_tokens(system_prompt, model)
+        user_tokens = count_tokens(user_prompt, model)
+        report[level] = {
+            "system_tokens": system_tokens,
+            "user_tokens": user_tokens,
+            "total_tokens": system_tokens + user_tokens,
+        }
+    return report
@@ -0,0 +1,267 @@
+import email.utils
+import math
+import random
+import threading
+import time
+
+from clusterapp.config import (
+    LLM_BACKOFF_BASE_SECONDS,
+    LLM_BACKOFF_MAX_SECONDS,
+    LLM_BURST_SECONDS,
+    LLM_EXPECTED_COMPLETION_TOKENS,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_TOKENS_PER_MINUTE,
+)
+from clusterapp.exceptions import ProviderUnavailableError
+from clusterapp.hedging import HedgeCancelled
+from clusterapp.metrics import metrics, span
+
+# HTTP statuses worth retrying: throttling and transient server errors
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+# Error class names of client-side timeouts and dropped connections (openai, httpx)
+RETRYABLE_ERROR_NAMES = {"APITimeoutError", "APIConnectionError", "TimeoutException", "ConnectError", "ReadTimeout"}
+
+# Refills continuously at rate_per_minute, holding at most burst_seconds of budget; a rate of 0 means unlimited.
+# Providers enforce per-minute quotas over shorter windows, so a full minute's burst would be throttled.
+# The bucket always holds at least the largest amount taken from it, so no single take can outgrow it.
+class TokenBucket:
+    def __init__(self, rate_per_minute, burst_seconds=LLM_BURST_SECONDS):
+        self.rate = rate_per_minute / 60
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Take amount now if the bucket holds enough and return 0, else return the seconds until it will
+    def try_acquire(self, amount=1):
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            self.capacity = max(self.capacity, amount)
+            self._refill()
+            if self.available >= amount:
+                self.available -= amount
+                return 0.0
+            return (amount - self.available) / self.rate
+
+    # Take amount from the bucket, waiting until it has refilled enough; returns the seconds waited
+    def acquire(self, amount=1):
+        waited = 0.0
+        while True:
+            delay = self.try_acquire(amount)
+            if not delay:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    # Correct an earlier estimate once the real amount is known; the bucket may go below zero
+    def adjust(self, amount):
+        if not self.rate:
+            return
+        with self._lock:
+            self._refill()
+            self.available = min(self.capacity, self.available - amount)
+
+# Concurrency limit that halves on throttling and grows by one after a limit's worth of successes (AIMD)
+class AdaptiveConcurrency:
+    def __init__(self, max_limit, min_limit=1):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = max_limit
+        self.active = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.active >= self.limit:
+                self._condition.wait()
+            self.active += 1
+
+    def release(self, throttled=False):
+        with self._condition:
+            self.active -= 1
+            if throttled:
+                self.limit = max(self.min_limit, math.ceil(self.limit / 2))
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._successes = 0
+            self._condition.notify_all()
+
+# HTTP status of a provider error, if it carries one
+def error_status(error):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+def is_retryable(error):
+    status = error_status(error)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    return type(error).__name__ in RETRYABLE_ERROR_NAMES
+
+# Seconds the provider asked us to wait, from a Retry-After header, if any
+def retry_after_seconds(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+# Process-wide limiter for one model: request and token budgets, adaptive concurrency and retries
+class RateLimiter:
+    def __init__(
+        self,
+        requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+        max_concurrency=LLM_MAX_CONCURRENCY,
+        max_retries=LLM_MAX_RETRIES,
+        backoff_base=LLM_BACKOFF_BASE_SECONDS,
+        backoff_max=LLM_BACKOFF_MAX_SECONDS,
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.throttled = 0
+        self.retries = 0
+        self.failures = 0
+        self.abandoned = 0
+
+    # Full-jitter exponential backoff, or the provider's Retry-After when it is longer
+    def backoff_seconds(self, attempt, error):
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return max(delay, retry_after_seconds(error) or 0.0)
+
+    # Call function once the budgets allow it, retrying throttled and transient failures.
+    # function returns (result, tokens used or None); can_retry() is checked before each retry.
+    # A request given up through cancelled (a hedging CancelToken) keeps its slot and tokens until
+    # it actually ends, since the provider may still be generating and billing them.
+    def call(self, function, estimated_tokens, can_retry=None, cancelled=None):
+        for attempt in range(self.max_retries + 1):
+            with span("rate_limit_wait"):
+                self.concurrency.acquire()
+                waited = self.requests.acquire(1) + self.tokens.acquire(estimated_tokens)
+            if waited:
+                metrics.observe("clusterapp_rate_limit_wait_seconds", waited)
+
+            if cancelled is not None and cancelled.is_set():
+                # Given up while waiting for the budgets: never send it
+                self.concurrency.release()
+                self.tokens.adjust(-estimated_tokens)
+                raise HedgeCancelled()
+            throttled = False
+            tokens_used = None
+            unspent_tokens = 0
+            try:
+                result, tokens_used = function()
+            except Exception as e:
+                if cancelled is not None and cancelled.is_set():
+                    # Given up by the caller, whose cancellation usually caused this error (a closed
+                    # response). Only the tokens it used before it stopped are counted, if known.
+                    tokens_used = getattr(e, "tokens_used", None)
+                    with self._lock:
+                        self.calls += 1
+                        self.abandoned += 1
+                    if isinstance(e, HedgeCancelled):
+                        raise
+                    raise HedgeCancelled() from e
+                throttled = error_status(e) == 429
+                # A throttled request was rejected unprocessed; any other failure generated nothing,
+                # though its prompt may have been counted
+                unspent_tokens = (
+                    estimated_tokens if throttled else min(estimated_tokens, LLM_EXPECTED_COMPLETION_TOKENS)
+                )
+                retry = is_retryable(e) and attempt < self.max_retries and (can_retry is None or can_retry())
+                with self._lock:
+                    self.calls += 1
+                    self.throttled += throttled
+                    self.retries += retry
+                    self.failures += not retry
+                if throttled:
+                    metrics.increment("clusterapp_rate_limit_throttled_total")
+                if not retry:
+                    if is_retryable(e):
+                        raise ProviderUnavailableError(
+                            "The AI provider is busy or rate limiting requests right now. "
+                            "Please try again in a minute."
+                        ) from e
+                    raise
+                metrics.increment("clusterapp_rate_limit_retries_total")
+                delay = self.backoff_seconds(attempt, e)
+            else:
+                with self._lock:
+                    self.calls += 1
+                return result
+            finally:
+                self.concurrency.release(throttled)
+                if tokens_used is not None:
+                    self.tokens.adjust(tokens_used - estimated_tokens)
+                elif unspent_tokens:
+                    self.tokens.adjust(-unspent_tokens)
+
+            with span("backoff", attempt=attempt + 1):
+                time.sleep(delay)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "throttled": self.throttled,
+                "retries": self.retries,
+                "failures": self.failures,
+                "abandoned": self.abandoned,
+                "concurrency_limit": self.concurrency.limit,
+                "active": self.concurrency.active,
+            }
+
+# One limiter per model, since provider quotas are per model
+class RateLimiterRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._limiters = {}
+
+    def get(self, model):
+        with self._lock:
+            limiter = self._limiters.get(model)
+            if limiter is None:
+                limiter = RateLimiter()
+                self._limiters[model] = limiter
+            return limiter
+
+    # Replace a model's limiter, e.g. to match a different quota
+    def configure(self, model, **settings):
+        limiter = RateLimiter(**settings)
+        with self._lock:
+            self._limiters[model] = limiter
+        return limiter
+
+    def stats(self):
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {model: limiter.stats() for model, limiter in limiters.items()}
+
+rate_limiters = RateLimiterRegistry()
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+from clusterapp.config import DIFFICULTY_LEVELS, PRIORITY_VOLUME_CEILING
+from clusterapp.difficulty import get_difficulty_parameters
+from clusterapp.metrics import span
+
+# A number with an optional thousand/million suffix, e.g. "300", "1.5k", "2M"
+NUMBER = r"(\d+(?:\.\d+)?)\s*([kKmM])?(?![A-Za-z])"
+
+# "300-500", "500 to 1000", "1k+" or a single "800"; groups: low, low suffix, high, high suffix, "+"
+VOLUME_PATTERN = rf"{NUMBER}(?:\s*(?:-|–|to)\s*{NUMBER})?\s*(\+)?"
+
+# "45%" or "30-40%"; groups: low, high
+COMPETITION_PATTERN = r"(\d+(?:\.\d+)?)\s*(?:(?:-|–|to)\s*(\d+(?:\.\d+)?)\s*)?%"
+
+# Multipliers of the number suffixes
+SUFFIX_SCALE = {"k": 1e3, "m": 1e6}
+
+def _text_column(df, column):
+    if column not in df.columns:
+        return pd.Series(pd.NA, index=df.index, dtype="string")
+    return df[column].astype("string")
+
+# Apply a parser to each distinct value once and spread the result over the rows.
+# Generated metrics repeat a lot, so combined result sets have far fewer distinct values than rows.
+def _parse_distinct(values, parse):
+    codes, uniques = pd.factorize(values)
+    parsed = parse(pd.Series(uniques, dtype="string"))
+    # Missing values have code -1, which reindexes to NaN
+    return parsed.reindex(codes).set_axis(values.index)
+
+# Drop thousands separators so "1,000" is one number
+def _strip_separators(values):
+    return values.str.replace(r"(?<=\d),(?=\d{3})", "", regex=True)
+
+def _to_float(values):
+    return pd.to_numeric(values, errors="coerce").astype(float)
+
+def _scale(suffix):
+    return suffix.str.lower().map(SUFFIX_SCALE).astype(float).fillna(1.0)
+
+# Monthly search volume ranges as (volume_min, volume_max); an open-ended "1000+" has no maximum
+def parse_search_volume(values):
+    parts = _strip_separators(values.astype("string")).str.extract(VOLUME_PATTERN)
+    # A suffix on the upper bound also applies to a bare lower bound, as in "1-5k"
+    low = _to_float(parts[0]) * _scale(parts[1].fillna(parts[3]))
+    high = _to_float(parts[2]) * _scale(parts[3])
+    open_ended = parts[4].notna() & high.isna()
+    high = high.fillna(low).mask(open_ended)
+    return pd.DataFrame({"volume_min": low, "volume_max": high}, index=values.index)
+
+# Competition percentage, the midpoint of a range, or a bare leading number when there is no "%"
+def parse_competition(values):
+    values = values.astype("string")
+    parts = values.str.extract(COMPETITION_PATTERN)
+    low = _to_float(parts[0])
+    high = _to_float(parts[1]).fillna(low)
+    bare = _to_float(values.str.extract(r"^\s*(\d+(?:\.\d+)?)(?![\d.])", expand=False))
+    pct = ((low + high) / 2).fillna(bare)
+    return pct.where(pct.between(0, 100))
+
+# 0-100 score favouring high search volume and low competition; NaN when either is unknown
+def priority_scores(volume_min, volume_max, competition_pct):
+    volume = ((volume_min + volume_max) / 2).fillna(volume_min)
+    volume_score = (np.log10(volume.clip(lower=0) + 1) / np.log10(PRIORITY_VOLUME_CEILING + 1)).clip(upper=1)
+    return (100 * volume_score * (1 - competition_pct / 100)).round(1)
+
+# Lower and upper bound of a range setting for each row's difficulty; no upper bound becomes infinity.
+# Rows of an unknown difficulty get NaN bounds and are never flagged.
+def _difficulty_bounds(difficulties, setting):
+    bounds = {}
+    for difficulty in DIFFICULTY_LEVELS:
+        low, high = get_difficulty_parameters(difficulty)[setting]
+        bounds[difficulty] = (low, np.inf if high is None else high)
+    codes, uniques = pd.factorize(difficulties)
+    # The extra last row is picked by code -1, i.e. a missing difficulty
+    table = np.array([bounds.get(d, (np.nan, np.nan)) for d in uniques] + [(np.nan, np.nan)], dtype=float)
+    return table[codes, 0], table[codes, 1]
+
+# Add numeric volume, competition and priority columns parsed from the free-text metrics, plus flags
+# for values outside the difficulty's ranges. Vectorized, so it is cheap on combined result sets.
+# difficulty applies to every row; without it each row's "difficulty" or "difficulty_level" is used.
+def add_metric_columns(df, difficulty=None):
+    with span("metric_parsing"):
+        volume = _parse_distinct(_text_column(df, "search_volume"), parse_search_volume)
+        competition = _parse_distinct(_text_column(df, "competition_level"), parse_competition)
+
+        if difficulty is not None:
+            difficulties = pd.Series(difficulty, index=df.index)
+        else:
+            column = "difficulty" if "difficulty" in df.columns else "difficulty_level"
+            difficulties = df[column] if column in df.columns else pd.Series(None, index=df.index)
+        volume_low, volume_high = _difficulty_bounds(difficulties, "volume_range")
+        competition_low, competition_high = _difficulty_bounds(difficulties, "competition_range")
+
+        # A volume range contradicts the difficulty when it does not overlap the difficulty's range
+        volume_max = volume["volume_max"].fillna(np.inf)
+        volume_out = (volume["volume_min"] > volume_high) | (volume_max < volume_low)
+        competition_out = (competition > competition_high) | (competition < competition_low)
+
+        return df.assign(
+            volume_min=volume["volume_min"],
+            volume_max=volume["volume_max"],
+            competition_pct=competition,
+            volume_out_of_range=volume_out,
+            competition_out_of_range=competition_out,
+            priority_score=priority_scores(volume["volume_min"], volume["volume_max"], competition),
+        )
@@ -0,0 +1,215 @@
+import bisect
+import math
+import threading
+
+from clusterapp.config import HISTORY_SEARCH_LIMIT, SIMILAR_TOPIC_THRESHOLD
+from clusterapp.topics import normalize_topic
+
+# Character n-grams of a canonical string, padded so word starts and ends count too
+def ngrams(text, size=3):
+    padded = f"{' ' * (size - 1)}{text} "
+    return {padded[i:i + size] for i in range(len(padded) - size + 1)}
+
+# In-memory index of every stored topic and keyword by canonical form, for autocomplete, fuzzy lookups
+# and "already generated" checks. Prefix lookups bisect sorted lists of word starts, bucketed by their
+# first two characters so inserts stay cheap; fuzzy lookups score character trigrams of entries whose
+# length can reach the threshold. Both stay in milliseconds over tens of thousands of entries.
+class HistoryIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            # canonical topic -> {"name": display name, "results": {(session_id, difficulty): None}}
+            self._topics = {}
+            # canonical keyword -> {"name": display keyword, "results": {(canonical topic, difficulty): count}}
+            self._keywords = {}
+            # First two characters -> sorted (text from a word start, kind, canonical) tuples
+            self._prefixes = {}
+            # trigram -> {(kind, canonical)}, and the number of trigrams of every (kind, canonical)
+            self._ngrams = {}
+            self._gram_counts = {}
+
+    @staticmethod
+    def _word_starts(canonical):
+        return [canonical] + [canonical[i + 1:] for i, char in enumerate(canonical) if char == " "]
+
+    def _insert(self, kind, canonical):
+        for text in self._word_starts(canonical):
+            bisect.insort(self._prefixes.setdefault(text[:2], []), (text, kind, canonical))
+        grams = ngrams(canonical)
+        for gram in grams:
+            self._ngrams.setdefault(gram, set()).add((kind, canonical))
+        self._gram_counts[(kind, canonical)] = len(grams)
+
+    def _delete(self, kind, canonical):
+        for text in self._word_starts(canonical):
+            bucket = self._prefixes.get(text[:2], [])
+            item = (text, kind, canonical)
+            position = bisect.bisect_left(bucket, item)
+            if position < len(bucket) and bucket[position] == item:
+                del bucket[position]
+                if not bucket:
+                    del self._prefixes[text[:2]]
+        self._gram_counts.pop((kind, canonical), None)
+        for gram in ngrams(canonical):
+            items = self._ngrams.get(gram)
+            if items is not None:
+                items.discard((kind, canonical))
+                if not items:
+                    del self._ngrams[gram]
+
+    # Index one stored result: its topic under a session and difficulty, and its keywords
+    def add(self, session_id, topic, difficulty, keywords=()):
+        canonical = normalize_topic(topic)
+        with self._lock:
+            entry = self._topics.get(canonical)
+            if entry is None:
+                entry = self._topics[canonical] = {"name": topic, "results": {}}
+                self._insert("topic", canonical)
+            entry["results"][(session_id, difficulty)] = None
+
+            for keyword in keywords:
+                keyword_canonical = normalize_topic(str(keyword))
+                if not keyword_canonical:
+                    continue
+                keyword_entry = self._keywords.get(keyword_canonical)
+                if keyword_entry is None:
+                    keyword_entry = self._keywords[keyword_canonical] = {"name": str(keyword), "results": {}}
+                    self._insert("keyword", keyword_canonical)
+                results = keyword_entry["results"]
+                results[(canonical, difficulty)] = results.get((canonical, difficulty), 0) + 1
+
+    # Forget one stored result; topics and keywords no result refers to any more leave the index
+    def remove(self, session_id, topic, difficulty, keywords=()):
+        canonical = normalize_topic(topic)
+        with self._lock:
+            entry = self._topics.get(canonical)
+            if entry is not None:
+                entry["results"].pop((session_id, difficulty), None)
+                if not entry["results"]:
+                    del self._topics[canonical]
+                    self._delete("topic", canonical)
+
+            for keyword in keywords:
+                keyword_canonical = normalize_topic(str(keyword))
+                keyword_entry = self._keywords.get(keyword_canonical)
+                if keyword_entry is None:
+                    continue
+                results = keyword_entry["results"]
+                count = results.get((canonical, difficulty), 0) - 1
+                if count > 0:
+                    results[(canonical, difficulty)] = count
+                else:
+                    results.pop((canonical, difficulty), None)
+                if not results:
+                    del self._keywords[keyword_canonical]
+                    self._delete("keyword", keyword_canonical)
+
+    # Display name of an already stored variant of topic, or topic itself if it is new
+    def topic_name(self, topic):
+        with self._lock:
+            entry = self._topics.get(normalize_topic(topic))
+            return topic if entry is None else entry["name"]
+
+    # The stored variant of topic and the difficulties generated for it in any session, or None
+    def find_topic(self, topic):
+        with self._lock:
+            entry = self._topics.get(normalize_topic(topic))
+            if entry is None:
+                return None
+            return self._topic_match(entry, 1.0)
+
+    def _topic_match(self, entry, score):
+        difficulties = {difficulty for _, difficulty in entry["results"]}
+        return {"kind": "topic", "text": entry["name"], "topic": entry["name"],
+                "difficulties": sorted(difficulties), "score": score}
+
+    def _keyword_match(self, entry, score):
+        # Display name of a stored topic the keyword was generated for, never a canonical form
+        topic = next((self._topics[t]["name"] for t, _ in entry["results"] if t in self._topics), None)
+        return {"kind": "keyword", "text": entry["name"], "topic": topic,
+                "difficulties": sorted({d for _, d in entry["results"]}), "score": score}
+
+    def _match(self, kind, canonical, score):
+        if kind == "topic":
+            return self._topic_match(self._topics[canonical], score)
+        return self._keyword_match(self._keywords[canonical], score)
+
+    # Autocomplete: entries with a word starting with prefix, whole-string matches and shorter entries first
+    def suggest(self, prefix, limit=HISTORY_SEARCH_LIMIT, kind=None):
+        query = normalize_topic(prefix)
+        if not query:
+            return []
+        with self._lock:
+            if len(query) >= 2:
+                buckets = [self._prefixes.get(query[:2], [])]
+            else:
+                buckets = [self._prefixes[key] for key in sorted(self._prefixes) if key.startswith(query)]
+            candidates = {}
+            for bucket in buckets:
+                position = bisect.bisect_left(bucket, (query,))
+                while position < len(bucket) and len(candidates) < limit * 4:
+                    text, item_kind, canonical = bucket[position]
+                    if not text.startswith(query):
+                        break
+                    position += 1
+                    if kind is None or item_kind == kind:
+                        from_start = text == canonical
+                        candidates[(item_kind, canonical)] = from_start or candidates.get((item_kind, canonical), False)
+            ranked = sorted(
+                candidates.items(),
+                key=lambda item: (item[0][0] != "topic", not item[1], len(item[0][1]), item[0][1])
+            )
+            return [
+                self._match(item_kind, canonical, 1.0 if from_start else 0.9)
+                for (item_kind, canonical), from_start in ranked[:limit]
+            ]
+
+    # Fuzzy lookup by trigram (Dice) similarity, best first. Only entries sharing one of the query's
+    # rarest trigrams can reach the threshold, so common trigrams are never scanned; candidates of a
+    # hopeless length are dropped before their shared trigrams are counted.
+    def similar(self, text, limit=HISTORY_SEARCH_LIMIT, kind=None, threshold=SIMILAR_TOPIC_THRESHOLD):
+        query = normalize_topic(text)
+        if not query:
+            return []
+        query_grams = ngrams(query)
+        # Dice >= threshold needs at least this many shared trigrams, and a trigram count in this range
+        required = math.ceil(threshold * len(query_grams) / 2)
+        shortest = threshold * len(query_grams) / (2 - threshold)
+        longest = len(query_grams) * (2 - threshold) / threshold
+        with self._lock:
+            postings = sorted((self._ngrams.get(gram, set()) for gram in query_grams), key=len)
+            candidates = set()
+            for items in postings[:len(postings) - required + 1]:
+                candidates.update(items)
+
+            scored = []
+            for item in candidates:
+                item_kind, canonical = item
+                gram_count = self._gram_counts[item]
+                if gram_count < shortest or gram_count > longest or (kind is not None and item_kind != kind):
+                    continue
+                score = 2 * sum(item in items for items in postings) / (len(query_grams) + gram_count)
+                if score >= threshold:
+                    scored.append((score, item_kind, canonical))
+            scored.sort(key=lambda item: (-item[0], item[1] != "topic", item[2]))
+            return [self._match(item_kind, canonical, round(score, 3)) for score, item_kind, canonical in scored[:limit]]
+
+    # Prefix matches first, then fuzzy matches not already listed if there is room for them
+    def search(self, text, limit=HISTORY_SEARCH_LIMIT, kind=None):
+        matches = self.suggest(text, limit, kind)
+        if len(matches) >= limit:
+            return matches
+        seen = {(match["kind"], match["text"]) for match in matches}
+        for match in self.similar(text, limit, kind, threshold=SIMILAR_TOPIC_THRESHOLD / 2):
+            if len(matches) >= limit:
+                break
+            if (match["kind"], match["text"]) not in seen:
+                matches.append(match)
+        return matches
+
+    def stats(self):
+        with self._lock:
+            return {"topics": len(self._topics), "keywords": len(self._keywords)}
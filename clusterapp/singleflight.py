@@ -0,0 +1,91 @@
+import threading
+
+from clusterapp.exceptions import SharedRequestError
+
+# How often a waiter checks that the leader of its call is still running, in seconds
+LEADER_CHECK_SECONDS = 1.0
+
+# One in-flight call that other callers with the same key can wait on
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        # Set when the leader stopped without an outcome to share, e.g. on a Streamlit rerun or stop
+        self.abandoned = False
+        self.leader = threading.current_thread()
+        self.waiters = 0
+
+# Process-wide single-flight: concurrent calls with the same key share one execution.
+# The first caller runs the function; the others wait for as long as it runs. Only a result or an
+# Exception is shared, each waiter getting its own SharedRequestError; if the leader stops with
+# a BaseException (a rerun, stop or interrupt of its own thread), a waiter becomes the new leader.
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    # Run function for key, or wait for the identical call already running.
+    # Returns (result, shared) where shared means the result came from another caller's execution.
+    def do(self, key, function, *args, **kwargs):
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = _Call()
+                    self._calls[key] = call
+                    self.executions += 1
+                else:
+                    call.waiters += 1
+
+            if leader:
+                return self._lead(key, call, function, args, kwargs), False
+
+            # The leader's requests are bounded by client timeouts and retry limits, so wait as long as it runs
+            while not call.done.wait(LEADER_CHECK_SECONDS):
+                if not call.leader.is_alive():
+                    break
+            if not call.done.is_set() or call.abandoned:
+                # Nothing to share: drop the dead call, if still registered, and take over
+                with self._lock:
+                    if self._calls.get(key) is call:
+                        del self._calls[key]
+                continue
+
+            with self._lock:
+                self.coalesced += 1
+            if call.error is not None:
+                # A fresh exception per waiter, so waiters never share and extend one traceback
+                raise SharedRequestError(str(call.error)) from call.error
+            return call.result, True
+
+    def _lead(self, key, call, function, args, kwargs):
+        try:
+            call.result = function(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        except BaseException:
+            call.abandoned = True
+            raise
+        finally:
+            # Later callers start a new execution instead of reusing this result
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+            }
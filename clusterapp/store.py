@@ -0,0 +1,183 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from clusterapp.config import DIFFICULTY_LEVELS, RESULT_STORE_MAX_BYTES, RESULT_STORE_SESSION_MAX_BYTES
+from clusterapp.search import HistoryIndex
+
+# Categorical dtype shared by every stored difficulty column
+DIFFICULTY_DTYPE = pd.CategoricalDtype(DIFFICULTY_LEVELS)
+
+# Convert a result table to its compact stored form: no row numbers, categorical difficulty, Arrow strings
+def compact_frame(df):
+    df = df.drop(columns=["number"], errors="ignore").reset_index(drop=True)
+    for column in df.columns:
+        if column == "difficulty_level":
+            values = df[column].astype(str)
+            extra = sorted(set(values) - set(DIFFICULTY_LEVELS))
+            df[column] = pd.Categorical(values, categories=DIFFICULTY_LEVELS + extra)
+        elif df[column].dtype == object or pd.api.types.is_string_dtype(df[column]):
+            df[column] = df[column].astype("string[pyarrow]")
+    return df
+
+# Keywords of a stored table, for the history index
+def _keywords(df):
+    return df["keyword"].tolist() if "keyword" in df.columns else []
+
+# Process-wide store of full generation results with per-session and global memory caps.
+# Entries are evicted least recently used first; any session can look up another's results.
+# Topics are stored under the name of their first stored variant, so "organic-gardening" and
+# "Organic Gardening" share entries, and the index lets every stored topic and keyword be searched.
+# Each entry remembers what generated it (e.g. LLMSettings.generation_key), so a result is only
+# found again for the same model settings.
+class ResultStore:
+    def __init__(self, max_bytes=RESULT_STORE_MAX_BYTES, max_session_bytes=RESULT_STORE_SESSION_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.max_session_bytes = max_session_bytes
+        self.total_bytes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # (session_id, topic, difficulty) -> (compact DataFrame, size in bytes, generated_by), oldest first
+        self._entries = OrderedDict()
+        # session_id -> OrderedDict of (topic, difficulty) -> None, oldest first
+        self._sessions = {}
+        self._session_bytes = {}
+        # session_id -> change counter, and the combined frame built at that version. The frame is
+        # dropped on every change to the session, so evicted results are never kept alive by it.
+        self._versions = {}
+        self._frames = {}
+        self.index = HistoryIndex()
+
+    def put(self, session_id, topic, difficulty, df, generated_by=None):
+        difficulty = sys.intern(difficulty)
+        df = compact_frame(df)
+        size = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            # Resolved under the lock, so concurrent variants of a new topic agree on one name
+            topic = sys.intern(self.index.topic_name(topic))
+            self._remove((session_id, topic, difficulty))
+            self._entries[(session_id, topic, difficulty)] = (df, size, generated_by)
+            self.index.add(session_id, topic, difficulty, _keywords(df))
+            self._sessions.setdefault(session_id, OrderedDict())[(topic, difficulty)] = None
+            self._session_bytes[session_id] = self._session_bytes.get(session_id, 0) + size
+            self._versions[session_id] = self._versions.get(session_id, 0) + 1
+            self._frames.pop(session_id, None)
+            self.total_bytes += size
+
+            # Evict the session's own oldest results first, then the oldest results globally,
+            # always keeping the entry that was just added
+            session = self._sessions[session_id]
+            while self._session_bytes[session_id] > self.max_session_bytes and len(session) > 1:
+                oldest_topic, oldest_difficulty = next(iter(session))
+                self._remove((session_id, oldest_topic, oldest_difficulty))
+                self.evictions += 1
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        session_id, topic, difficulty = key
+        self.index.remove(session_id, topic, difficulty, _keywords(entry[0]))
+        self._versions[session_id] = self._versions.get(session_id, 0) + 1
+        self._frames.pop(session_id, None)
+        self.total_bytes -= entry[1]
+        self._session_bytes[session_id] -= entry[1]
+        session = self._sessions[session_id]
+        del session[(topic, difficulty)]
+        if not session:
+            del self._sessions[session_id]
+            del self._session_bytes[session_id]
+
+    def get(self, session_id, topic, difficulty):
+        topic = self.index.topic_name(topic)
+        with self._lock:
+            entry = self._entries.get((session_id, topic, difficulty))
+            if entry is None:
+                return None
+            self._touch(session_id, topic, difficulty)
+            return entry[0].copy()
+
+    def _touch(self, session_id, topic, difficulty):
+        self._entries.move_to_end((session_id, topic, difficulty))
+        self._sessions[session_id].move_to_end((topic, difficulty))
+
+    # Most recent result for a topic (or a trivial variant of it) and difficulty from any session,
+    # generated by the same settings
+    def find(self, topic, difficulty, generated_by=None):
+        topic = self.index.topic_name(topic)
+        with self._lock:
+            for key, entry in reversed(self._entries.items()):
+                if key[1] == topic and key[2] == difficulty and entry[2] == generated_by:
+                    self._touch(*key)
+                    return entry[0].copy()
+        return None
+
+    # A session's results as {topic: {difficulty: DataFrame}}, least recently used first
+    def session_results(self, session_id):
+        with self._lock:
+            results = {}
+            for topic, difficulty in self._sessions.get(session_id, {}):
+                results.setdefault(topic, {})[difficulty] = self._entries[(session_id, topic, difficulty)][0]
+            return results
+
+    # Most recent result of every topic and difficulty across all sessions, as {topic: {difficulty: DataFrame}}
+    def latest_results(self):
+        with self._lock:
+            results = {}
+            for (_, topic, difficulty), (df, _, _) in reversed(self._entries.items()):
+                results.setdefault(topic, {}).setdefault(difficulty, df)
+            return results
+
+    # Counter that changes whenever a session's stored results change, for memoizing views of them
+    def version(self, session_id):
+        with self._lock:
+            return self._versions.get(session_id, 0)
+
+    # All of a session's results in one table with categorical topic and difficulty columns.
+    # The table is rebuilt only when the session's results change.
+    def session_frame(self, session_id):
+        version = self.version(session_id)
+        with self._lock:
+            cached = self._frames.get(session_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        frames = []
+        for topic, difficulties in self.session_results(session_id).items():
+            for difficulty, df in difficulties.items():
+                frames.append(df.assign(topic=topic, difficulty=difficulty))
+        if not frames:
+            return pd.DataFrame(columns=["topic", "difficulty", "keyword"])
+        combined = pd.concat(frames, ignore_index=True)
+        combined["topic"] = combined["topic"].astype("category")
+        combined["difficulty"] = combined["difficulty"].astype(DIFFICULTY_DTYPE)
+        leading = ["topic", "difficulty"]
+        combined = combined[leading + [c for c in combined.columns if c not in leading]]
+        with self._lock:
+            # Only keep a table of the session's current results
+            if session_id in self._sessions and self._versions.get(session_id) == version:
+                self._frames[session_id] = (version, combined)
+        return combined
+
+    def has_results(self, session_id):
+        with self._lock:
+            return session_id in self._sessions
+
+    def clear_session(self, session_id):
+        with self._lock:
+            for topic, difficulty in list(self._sessions.get(session_id, {})):
+                self._remove((session_id, topic, difficulty))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "sessions": len(self._sessions),
+                "total_bytes": self.total_bytes,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,46 @@
+import unicodedata
+from functools import lru_cache
+
+# Punctuation that is part of a name rather than a separator, as in "C#" and "F#".
+# Symbols such as "+" and "$" are kept anyway, so "C++" and "C#" never become plain "c".
+KEPT_PUNCTUATION = {"#"}
+
+# Words ending in "s" that are not plurals, and plurals the suffix rules below get wrong
+SINGULAR_FORMS = {
+    "news": "news", "series": "series", "species": "species", "always": "always", "perhaps": "perhaps",
+    "christmas": "christmas", "canvas": "canvas", "atlas": "atlas", "bias": "bias", "alias": "alias",
+    "lens": "lens", "chaos": "chaos", "cosmos": "cosmos", "pancreas": "pancreas", "diabetes": "diabetes",
+    "movies": "movie", "cookies": "cookie", "pies": "pie", "ties": "tie", "lies": "lie", "selfies": "selfie",
+    "smoothies": "smoothie", "brownies": "brownie", "zombies": "zombie", "hoodies": "hoodie",
+    "rookies": "rookie", "children": "child", "women": "woman", "men": "man", "teeth": "tooth", "feet": "foot",
+    "mice": "mouse", "geese": "goose",
+}
+
+# Singular of a lowercase word by simple suffix rules; short words and words in -ss, -us, -is are kept
+def singularize(word):
+    if word in SINGULAR_FORMS:
+        return SINGULAR_FORMS[word]
+    if len(word) <= 3 or not word.endswith("s") or word.endswith(("ss", "us", "is")):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("sses", "xes", "ches", "shes")):
+        return word[:-2]
+    return word[:-1]
+
+# Punctuation (Unicode category P*) separates words, except the few characters that belong to names
+def _is_separator(char):
+    return unicodedata.category(char).startswith("P") and char not in KEPT_PUNCTUATION
+
+# Canonical form of a topic, so trivial variants share a cache entry and stored results: case, accents,
+# separators such as "-", "_" and "/", "&" and simple plurals are normalized ("Organic-Gardens" ->
+# "organic garden"). Symbols and "#" are kept ("C++", "C#"). Only ever used as a key: singularized
+# forms like "buse" are never shown, display names are always the topic as it was entered.
+@lru_cache(maxsize=65536)
+def normalize_topic(topic):
+    text = unicodedata.normalize("NFKD", topic.casefold())
+    text = text.replace("&", " and ").replace("'", "").replace("’", "")
+    text = "".join(
+        " " if _is_separator(char) else char for char in text if not unicodedata.combining(char)
+    )
+    return " ".join(singularize(word) for word in text.split())
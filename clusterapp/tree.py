@@ -0,0 +1,127 @@
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from clusterapp.config import DRILLDOWN_MAX_DEPTH, TOPIC_TREE_MAX_NODES
+from clusterapp.exceptions import ClusterGenerationError
+from clusterapp.generator import fetch_content_clusters
+from clusterapp.scoring import add_metric_columns
+from clusterapp.topics import normalize_topic
+
+# Process-wide tree of keyword sub-clusters. A node is a path (root topic, keyword, sub-keyword, ...)
+# whose keyword table was generated on demand; nodes are never generated twice while they are kept.
+# Least recently used nodes are evicted past max_nodes and come back from the response cache.
+# The top level is not kept here: each session passes its own result for the topic as root.
+class TopicTree:
+    def __init__(self, max_nodes=TOPIC_TREE_MAX_NODES, max_depth=DRILLDOWN_MAX_DEPTH):
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        # (difficulty, normalized path) -> keyword DataFrame of that node, oldest first
+        self._nodes = OrderedDict()
+        self.expansions = 0
+
+    @staticmethod
+    def _key(path, difficulty):
+        return difficulty, tuple(normalize_topic(node) for node in path)
+
+    def _put(self, path, difficulty, df):
+        key = self._key(path, difficulty)
+        with self._lock:
+            self._nodes[key] = df.reset_index(drop=True)
+            self._nodes.move_to_end(key)
+            while len(self._nodes) > self.max_nodes:
+                self._nodes.popitem(last=False)
+
+    # Keyword table of a node, or None if it has not been expanded
+    def children(self, path, difficulty):
+        key = self._key(path, difficulty)
+        with self._lock:
+            df = self._nodes.get(key)
+            if df is not None:
+                self._nodes.move_to_end(key)
+            return df
+
+    def is_expanded(self, path, difficulty):
+        return self.children(path, difficulty) is not None
+
+    # Level of the keyword table at path: the root topic's own keywords are level 1
+    @staticmethod
+    def depth(path):
+        return len(path)
+
+    # Whether the node at path is within the tree's max_depth levels below the root topic
+    def can_expand(self, path):
+        return self.depth(path) <= self.max_depth
+
+    # Generate sub-clusters of the last keyword in path, unless that node already exists
+    def expand(self, path, difficulty, cache=None, llm_settings=None):
+        path = tuple(path)
+        existing = self.children(path, difficulty)
+        if existing is not None:
+            return existing
+        if not self.can_expand(path):
+            raise ClusterGenerationError(
+                f"Keywords can only be expanded to {self.max_depth} levels below the topic."
+            )
+
+        df = fetch_content_clusters(
+            path[-1], difficulty, cache=cache, llm_settings=llm_settings, parent_path=path[:-1]
+        )
+        if df is None or "keyword" not in df.columns:
+            raise ClusterGenerationError("The API response didn't contain any keywords.")
+        # Drop sub-clusters that only repeat a keyword from the path
+        in_path = {normalize_topic(node) for node in path}
+        df = df[~df["keyword"].astype(str).map(normalize_topic).isin(in_path)]
+        self._put(path, difficulty, add_metric_columns(df, difficulty))
+        with self._lock:
+            self.expansions += 1
+        return self.children(path, difficulty)
+
+    # Keyword table of a node, where the top level is root, the caller's own result for the topic
+    def node(self, path, difficulty, root):
+        return root if len(path) == 1 else self.children(path, difficulty)
+
+    # Every expanded node below a topic, depth first, as (path, DataFrame)
+    def walk(self, topic, difficulty, root):
+        stack = [(topic,)]
+        while stack:
+            path = stack.pop()
+            df = self.node(path, difficulty, root)
+            if df is None:
+                continue
+            yield path, df
+            stack.extend((*path, keyword) for keyword in reversed(df["keyword"].astype(str).tolist()))
+
+    # The expanded tree as one flat table: one row per keyword with its level and parent path
+    def to_frame(self, topic, difficulty, root):
+        frames = [
+            df.assign(level=len(path), parent=path[-1], path=" > ".join(path))
+            for path, df in self.walk(topic, difficulty, root)
+        ]
+        if not frames:
+            return pd.DataFrame(columns=["level", "path", "parent", "keyword"])
+        tree_df = pd.concat(frames, ignore_index=True)
+        leading = ["level", "path", "parent", "keyword"]
+        return tree_df[leading + [c for c in tree_df.columns if c not in leading]]
+
+    # The expanded tree as nested records, each keyword carrying its "children" if it was expanded
+    def to_nested(self, topic, difficulty, root):
+        def build(path):
+            df = self.node(path, difficulty, root)
+            if df is None:
+                return None
+            records = []
+            for record in df.astype(object).where(df.notna(), None).to_dict("records"):
+                children = build((*path, str(record["keyword"])))
+                if children is not None:
+                    record["children"] = children
+                records.append(record)
+            return records
+
+        return {"topic": topic, "difficulty": difficulty, "keywords": build((topic,)) or []}
+
+    def stats(self):
+        with self._lock:
+            return {"nodes": len(self._nodes), "expansions": self.expansions}
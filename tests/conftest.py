@@ -0,0 +1,21 @@
+import pytest
+
+from clusterapp.benchmark import FAKE_MODEL_NAME, FakeChatModel
+from clusterapp.hedging import hedger
+from clusterapp.llm import LLMSettings, llm_registry
+from clusterapp.ratelimit import rate_limiters
+
+
+# Register a FakeChatModel for LLMSettings of its own, with an unlimited rate limiter.
+# Returns a factory taking the fake's options (instant replies by default) and returning (fake, settings).
+@pytest.fixture
+def fake_llm():
+    def make(hedge=False, **options):
+        fake = FakeChatModel(**{"latency": 0, "token_rate": 0, **options})
+        settings = LLMSettings(model=FAKE_MODEL_NAME, hedge=hedge)
+        llm_registry.register(settings, fake)
+        rate_limiters.configure(FAKE_MODEL_NAME, requests_per_minute=0, tokens_per_minute=0)
+        hedger.clear()
+        return fake, settings
+
+    return make
@@ -0,0 +1,19 @@
+import time
+
+from clusterapp.bulk import run_bulk_jobs
+
+
+def test_closing_a_bulk_run_cancels_queued_jobs(fake_llm):
+    fake, settings = fake_llm(latency=0.2)
+    jobs = [(f"bulk topic {i}", "Low") for i in range(16)]
+    results = run_bulk_jobs(jobs, concurrency=2, max_retries=0, llm_settings=settings)
+    next(results)
+
+    started = time.perf_counter()
+    results.close()
+    assert time.perf_counter() - started < 0.1
+
+    # Only the jobs already running finish; the queued ones never call the model
+    time.sleep(0.6)
+    assert fake.calls <= 4
+
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+from clusterapp.dedupe import drop_near_duplicates, group_keywords, keyword_vectors, near_duplicate_labels
+
+
+def merged(first, second):
+    return near_duplicate_labels([first, second])[1] == 0
+
+
+def test_synonymous_modifiers_merge():
+    assert merged("best running shoe brands", "top running shoe brands")
+    assert merged("best running shoe brands", "greatest running shoe brands")
+    assert merged("nike vs adidas running shoes", "nike versus adidas running shoes")
+    assert merged("running shoe reviews", "running shoe review")
+
+
+def test_distinct_intents_stay_apart():
+    assert not merged("running shoes guide", "running shoes ideas")
+    assert not merged("running shoes guide", "running shoes tips")
+    assert not merged("cheap running shoes", "affordable running shoes")
+
+
+def test_vectors_are_deterministic_and_normalized():
+    keywords = ["organic gardening", "Organic  Gardening", "C++ tutorials", "jardín orgánico"]
+    vectors = keyword_vectors(keywords)
+    assert vectors.shape[0] == len(keywords)
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1, rtol=1e-5)
+    np.testing.assert_array_equal(vectors[0], vectors[1])
+    np.testing.assert_array_equal(vectors, keyword_vectors(keywords))
+
+
+def test_ngrams_do_not_span_keywords():
+    # Each keyword's vector is the same whatever keywords it is vectorized with
+    alone = keyword_vectors(["ab", "cd"])
+    together = keyword_vectors(["ab", "cd", "ab cd"])
+    assert np.count_nonzero(alone[0]) == np.count_nonzero(together[0])
+    assert np.count_nonzero(alone[1]) == np.count_nonzero(together[1])
+
+
+def test_drop_near_duplicates_keeps_the_first_row():
+    df = pd.DataFrame({"keyword": ["top hiking boots", "hiking boots guide", "best hiking boots"], "row": [1, 2, 3]})
+    assert drop_near_duplicates(df)["row"].tolist() == [1, 2]
+
+
+def test_groups_are_numbered_in_order_of_first_appearance():
+    keywords = ["vegan dinner recipes", "tax deadlines", "vegan dinner recipe ideas", "tax deadline dates"]
+    assert group_keywords(keywords).tolist() == [1, 2, 1, 2]
+
+
+def test_no_keywords():
+    assert len(near_duplicate_labels([])) == 0
+    assert keyword_vectors([]).shape[0] == 0
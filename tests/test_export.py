@@ -0,0 +1,41 @@
+import io
+import zipfile
+
+import pandas as pd
+import pytest
+from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+
+from clusterapp.export import EXPORT_FORMATS, bundle_bytes, export_bytes, iter_results
+
+RESULTS = {
+    "t 1": {"Low": pd.DataFrame({"keyword": ["a", "b"]})},
+    "t_1": {"Low": pd.DataFrame({"keyword": ["c"]}), "High": pd.DataFrame({"keyword": ["d"]})},
+}
+
+
+# What a download button does with the value its deferred data callable returns
+def served_bytes(data):
+    return convert_data_to_bytes_and_infer_mime(data, unsupported_error=TypeError("unsupported"))[0]
+
+
+@pytest.mark.parametrize("export_format", list(EXPORT_FORMATS))
+def test_bundle_can_be_served_by_a_download_button(export_format):
+    payload = served_bytes(bundle_bytes(iter_results(RESULTS), export_format))
+    with zipfile.ZipFile(io.BytesIO(payload)) as bundle:
+        assert len(bundle.namelist()) == 3
+
+
+@pytest.mark.parametrize("export_format", list(EXPORT_FORMATS))
+def test_single_table_can_be_served_by_a_download_button(export_format):
+    assert served_bytes(export_bytes(RESULTS["t 1"]["Low"], export_format))
+
+
+def test_clashing_member_names_are_numbered():
+    with zipfile.ZipFile(io.BytesIO(bundle_bytes(iter_results(RESULTS)))) as bundle:
+        names = bundle.namelist()
+        assert names == [
+            "t_1_low_difficulty_content_clusters.csv",
+            "t_1_low_difficulty_content_clusters_2.csv",
+            "t_1_high_difficulty_content_clusters.csv",
+        ]
+        assert pd.read_csv(bundle.open(names[1]))["keyword"].tolist() == ["c"]
@@ -0,0 +1,89 @@
+import re
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from clusterapp.config import KEYWORD_COUNT, TOP_UP_MAX_ROUNDS
+from clusterapp.generator import top_up_keywords
+
+
+def starting_keywords(count):
+    return pd.DataFrame({"keyword": [f"keyword number {word}" for word in "abcdefghij"[:count]]})
+
+
+# Wrap the fake's invoke to record every user prompt; reply, if given, replaces the fake's answer
+def record_prompts(fake, monkeypatch, reply=None):
+    prompts = []
+    invoke = fake.invoke
+
+    def recording_invoke(messages):
+        prompts.append(messages[-1].content)
+        return invoke(messages) if reply is None else reply(messages)
+
+    monkeypatch.setattr(fake, "invoke", recording_invoke)
+    return prompts
+
+
+def requested_count(prompt):
+    return int(re.search(r"generate EXACTLY (\d+) additional", prompt).group(1))
+
+
+def test_asks_for_exactly_the_missing_count(fake_llm, monkeypatch):
+    fake, settings = fake_llm()
+    prompts = record_prompts(fake, monkeypatch)
+    df = top_up_keywords("organic gardening", "Low", starting_keywords(7), llm_settings=settings)
+    assert [requested_count(prompt) for prompt in prompts] == [KEYWORD_COUNT - 7]
+    assert len(df) == KEYWORD_COUNT
+    assert df["keyword"].tolist()[:7] == starting_keywords(7)["keyword"].tolist()
+
+
+def test_stops_after_the_maximum_rounds(fake_llm, monkeypatch):
+    fake, settings = fake_llm(short_rate=1.0)
+    prompts = record_prompts(fake, monkeypatch)
+    df = top_up_keywords("organic gardening", "Low", starting_keywords(3), llm_settings=settings)
+    assert len(prompts) == TOP_UP_MAX_ROUNDS
+    assert 3 < len(df) < KEYWORD_COUNT
+    # Each round asks only for what the rounds before it left missing
+    assert requested_count(prompts[0]) == KEYWORD_COUNT - 3
+    assert requested_count(prompts[1]) < requested_count(prompts[0])
+
+
+@pytest.mark.parametrize("max_rounds", [0, 1, 3])
+def test_max_rounds_can_be_overridden(fake_llm, monkeypatch, max_rounds):
+    fake, settings = fake_llm(short_rate=1.0)
+    prompts = record_prompts(fake, monkeypatch)
+    top_up_keywords("organic gardening", "Low", starting_keywords(3), llm_settings=settings, max_rounds=max_rounds)
+    assert len(prompts) == max_rounds
+
+
+def test_stops_early_when_a_round_adds_nothing(fake_llm, monkeypatch):
+    fake, settings = fake_llm()
+    existing = starting_keywords(5)
+    repeated = '{"keywords": [' + ", ".join(f'{{"keyword": "{k}"}}' for k in existing["keyword"]) + "]}"
+    prompts = record_prompts(
+        fake, monkeypatch, reply=lambda messages: SimpleNamespace(content=repeated, usage_metadata=None)
+    )
+    df = top_up_keywords("organic gardening", "Low", existing, llm_settings=settings, max_rounds=5)
+    assert len(prompts) == 1
+    assert df["keyword"].tolist() == existing["keyword"].tolist()
+
+
+def test_a_failed_follow_up_keeps_the_keywords_collected(fake_llm, monkeypatch):
+    fake, settings = fake_llm(short_rate=1.0)
+    prompts = []
+    invoke = fake.invoke
+
+    # The first round succeeds with a short answer and the second one fails
+    def failing_second_round(messages):
+        prompts.append(messages[-1].content)
+        if len(prompts) > 1:
+            raise RuntimeError("connection reset")
+        return invoke(messages)
+
+    monkeypatch.setattr(fake, "invoke", failing_second_round)
+    existing = starting_keywords(3)
+    df = top_up_keywords("organic gardening", "Low", existing, llm_settings=settings)
+    assert len(prompts) == 2
+    assert len(df) > len(existing)
+    assert df["keyword"].tolist()[:3] == existing["keyword"].tolist()
@@ -0,0 +1,100 @@
+import time
+
+from clusterapp import generator
+from clusterapp.benchmark import FAKE_MODEL_NAME
+from clusterapp.config import LLM_EXPECTED_COMPLETION_TOKENS, LLM_HEDGE_MAX_RATIO, LLM_HEDGE_MIN_SAMPLES
+from clusterapp.generator import request_content_clusters
+from clusterapp.hedging import hedger
+from clusterapp.prompts import build_prompts
+from clusterapp.ratelimit import rate_limiters
+
+KEY = (FAKE_MODEL_NAME, "initial")
+
+
+def generate(settings, topic):
+    return request_content_clusters(*build_prompts(topic, "Low"), llm_settings=settings)
+
+
+# Serve the fake's n-th reply with the n-th (truncate, seconds to first token) of script; later replies are instant.
+# truncate cuts the reply off partway, so only its complete keywords can be salvaged.
+def script_replies(fake, monkeypatch, *script):
+    reply = fake._reply
+    served = []
+
+    def scripted(messages):
+        text, _ = reply(messages)
+        truncate, latency = script[len(served)] if len(served) < len(script) else (False, 0)
+        served.append(latency)
+        return (text[:len(text) // 2] if truncate else text), latency
+
+    monkeypatch.setattr(fake, "_reply", scripted)
+
+
+# Make the calls hedging waits for, then hedge after a fixed delay so tests do not depend on their timings
+def warm_up(settings, monkeypatch):
+    for i in range(LLM_HEDGE_MIN_SAMPLES):
+        generate(settings, f"warm-up topic {i}")
+    monkeypatch.setattr(hedger, "hedge_delay", lambda key: 0.02)
+
+
+def test_nothing_is_hedged_until_enough_latencies_were_seen(fake_llm):
+    fake, settings = fake_llm(hedge=True, latency=0.005)
+    for i in range(LLM_HEDGE_MIN_SAMPLES - 1):
+        generate(settings, f"topic {i}")
+        assert hedger.hedge_delay(KEY) is None
+    generate(settings, "last warm-up topic")
+    assert hedger.hedge_delay(KEY) is not None
+    assert hedger.stats()["hedged"] == 0
+    assert fake.calls == LLM_HEDGE_MIN_SAMPLES
+
+
+def test_hedges_are_capped_at_a_share_of_all_calls(fake_llm, monkeypatch):
+    fake, settings = fake_llm(hedge=True, latency=0.001, tail_multiplier=50)
+    warm_up(settings, monkeypatch)
+    # From now on every attempt is a straggler worth hedging
+    fake.tail_rate = 1.0
+    for i in range(30):
+        df, salvaged = generate(settings, f"slow topic {i}")
+        assert len(df) and not salvaged
+    stats = hedger.stats()
+    assert stats["calls"] == LLM_HEDGE_MIN_SAMPLES + 30
+    assert stats["hedged"] == int(LLM_HEDGE_MAX_RATIO * stats["calls"])
+    assert fake.calls == stats["calls"] + stats["hedged"]
+
+
+def test_a_complete_reply_beats_an_earlier_salvaged_one(fake_llm, monkeypatch):
+    fake, settings = fake_llm(hedge=True)
+    warm_up(settings, monkeypatch)
+    # The first attempt ends first with a truncated reply; the hedge ends later with a complete one
+    script_replies(fake, monkeypatch, (True, 0.1), (False, 0.2))
+    df, salvaged = generate(settings, "organic gardening")
+    assert not salvaged
+    assert hedger.stats()["hedge_wins"] == 1
+
+
+def test_the_loser_keeps_its_slot_and_tokens_until_it_ends(fake_llm, monkeypatch):
+    fake, settings = fake_llm(hedge=True)
+    warm_up(settings, monkeypatch)
+    limiter = rate_limiters.configure(FAKE_MODEL_NAME, requests_per_minute=0, tokens_per_minute=10 ** 9)
+    adjustments = []
+    monkeypatch.setattr(limiter.tokens, "adjust", adjustments.append)
+    # No tokenizer is downloaded in tests, so count the loser's prompt roughly
+    monkeypatch.setattr(generator, "count_tokens", lambda text, model: len(text) // 4)
+
+    script_replies(fake, monkeypatch, (False, 0.3), (False, 0))
+    started = time.monotonic()
+    df, salvaged = generate(settings, "organic gardening")
+    assert time.monotonic() - started < 0.25
+    assert hedger.stats()["hedge_wins"] == 1
+    # The loser is still waiting for its first token, and the provider may still bill it
+    assert limiter.stats()["active"] == 1
+    assert len(adjustments) == 1
+
+    while limiter.stats()["active"]:
+        assert time.monotonic() - started < 5
+        time.sleep(0.01)
+    stats = limiter.stats()
+    assert (stats["calls"], stats["abandoned"]) == (2, 1)
+    # The loser stopped at its first chunk: its prompt is counted and its whole completion refunded
+    assert len(adjustments) == 2
+    assert adjustments[1] == -LLM_EXPECTED_COMPLETION_TOKENS
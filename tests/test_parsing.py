@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from clusterapp.exceptions import ClusterGenerationError
+from clusterapp.parsing import KeywordStreamParser, parse_keywords_response, salvage_keywords
+
+REPLY = json.dumps({"keywords": [
+    {"keyword": "organic compost", "search_volume": "100-200"},
+    {"keyword": 'the "no dig" method', "explanation": "a \\ backslash and a } brace"},
+    {"keyword": "raised beds", "search_volume": "1k+"},
+]}, indent=2)
+
+
+def feed_in_chunks(text, size):
+    parser = KeywordStreamParser()
+    keywords = []
+    for start in range(0, len(text), size):
+        keywords.extend(parser.feed(text[start:start + size]))
+    return keywords
+
+
+@pytest.mark.parametrize("size", [1, 3, 17, len(REPLY)])
+def test_keywords_split_across_chunks(size):
+    keywords = feed_in_chunks(REPLY, size)
+    assert [k["keyword"] for k in keywords] == ["organic compost", 'the "no dig" method', "raised beds"]
+
+
+def test_each_keyword_is_returned_once_it_is_complete():
+    parser = KeywordStreamParser()
+    first_end = REPLY.index("}") + 1
+    assert [k["keyword"] for k in parser.feed(REPLY[:first_end])] == ["organic compost"]
+    assert parser.feed(REPLY[first_end:first_end + 10]) == []
+
+
+def test_escaped_quotes_and_braces_inside_strings():
+    keywords = feed_in_chunks(REPLY, 5)
+    assert keywords[1]["explanation"] == "a \\ backslash and a } brace"
+
+
+def test_trailing_commas_are_tolerated():
+    reply = '{"keywords": [{"keyword": "a", "search_volume": "10",}, {"keyword": "b",},]}'
+    assert [k["keyword"] for k in feed_in_chunks(reply, 4)] == ["a", "b"]
+    assert parse_keywords_response(reply)["keyword"].tolist() == ["a", "b"]
+
+
+def test_prose_around_the_json_is_ignored():
+    df = parse_keywords_response(f"Here you go:\n{REPLY}\nEnjoy!")
+    assert len(df) == 3
+
+
+def test_reply_truncated_inside_an_object():
+    truncated = REPLY[:REPLY.index("raised beds") + 5]
+    with pytest.raises(ClusterGenerationError):
+        parse_keywords_response(truncated)
+    df = salvage_keywords(truncated)
+    assert df["keyword"].tolist() == ["organic compost", 'the "no dig" method']
+
+
+def test_nothing_to_salvage():
+    with pytest.raises(ClusterGenerationError):
+        salvage_keywords('{"keywords": [{"keyword": "cut off')
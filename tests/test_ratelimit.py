@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+from clusterapp.benchmark import FakeProviderError
+from clusterapp.config import LLM_EXPECTED_COMPLETION_TOKENS
+from clusterapp.exceptions import ProviderUnavailableError
+from clusterapp.ratelimit import RateLimiter, TokenBucket
+
+# A full keyword set's reservation: a typical prompt plus the expected completion
+ESTIMATED_TOKENS = 600 + LLM_EXPECTED_COMPLETION_TOKENS
+
+
+# A function for RateLimiter.call that raises the given errors in turn, then succeeds
+def failing(*errors):
+    remaining = list(errors)
+
+    def call():
+        if remaining:
+            raise remaining.pop(0)
+        return "ok", ESTIMATED_TOKENS
+
+    return call
+
+
+def test_default_budget_admits_concurrent_requests_at_once():
+    limiter = RateLimiter()
+    assert all(limiter.tokens.try_acquire(ESTIMATED_TOKENS) == 0 for _ in range(8))
+    assert all(limiter.requests.try_acquire(1) == 0 for _ in range(8))
+
+
+def test_the_bucket_grows_to_hold_the_largest_reservation():
+    bucket = TokenBucket(6000, burst_seconds=1)
+    assert bucket.capacity == 100
+    bucket.try_acquire(100)
+    # A reservation above the old capacity waits for that much budget, not for a full bucket plus debt
+    assert bucket.try_acquire(150) == pytest.approx(1.5, abs=0.05)
+    assert bucket.capacity == 150
+    time.sleep(0.2)
+    bucket._refill()
+    assert bucket.available <= 150
+
+
+def test_retries_are_not_slowed_by_tokens_of_failed_attempts():
+    limiter = RateLimiter(backoff_base=0)
+    throttled = FakeProviderError(429, "Rate limit reached", retry_after=0.1)
+    started = time.monotonic()
+    for _ in range(3):
+        assert limiter.call(failing(throttled, throttled), ESTIMATED_TOKENS) == "ok"
+    assert time.monotonic() - started < 1.5
+    assert limiter.stats()["retries"] == 6
+
+
+def test_a_throttled_attempt_refunds_its_whole_estimate():
+    limiter = RateLimiter(tokens_per_minute=60 * ESTIMATED_TOKENS, max_retries=0)
+    with pytest.raises(ProviderUnavailableError):
+        limiter.call(failing(FakeProviderError(429, "Rate limit reached")), ESTIMATED_TOKENS)
+    assert limiter.tokens.available == limiter.tokens.capacity
+
+
+def test_a_failed_attempt_refunds_its_completion():
+    limiter = RateLimiter(tokens_per_minute=60 * ESTIMATED_TOKENS, max_retries=0)
+    with pytest.raises(ValueError):
+        limiter.call(failing(ValueError("bad request")), ESTIMATED_TOKENS)
+    # Only the prompt is still counted, less what refilled meanwhile
+    assert limiter.tokens.available == pytest.approx(limiter.tokens.capacity - 600, abs=200)
+    assert limiter.stats()["failures"] == 1
@@ -0,0 +1,85 @@
+import math
+
+import pandas as pd
+import pytest
+
+from clusterapp.scoring import add_metric_columns, parse_competition, parse_search_volume
+
+NAN = math.nan
+
+
+def same(actual, expected):
+    return (pd.isna(actual) and math.isnan(expected)) or actual == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("text, volume_min, volume_max", [
+    ("300-500", 300, 500),
+    ("500 to 1000", 500, 1000),
+    ("2k–3k", 2000, 3000),
+    ("1-5k", 1000, 5000),
+    ("1,000+", 1000, NAN),
+    ("1k+", 1000, NAN),
+    ("800", 800, 800),
+    ("1.5M", 1.5e6, 1.5e6),
+    ("Estimated volume of 4500 searches per month", 4500, 4500),
+    ("10,000-20,000 monthly searches", 10000, 20000),
+    ("n/a", NAN, NAN),
+])
+def test_search_volume(text, volume_min, volume_max):
+    parsed = parse_search_volume(pd.Series([text], dtype="string")).iloc[0]
+    assert same(parsed["volume_min"], volume_min)
+    assert same(parsed["volume_max"], volume_max)
+
+
+@pytest.mark.parametrize("text, pct", [
+    ("45%", 45),
+    ("30-40%", 35),
+    ("80 to 90%", 85),
+    ("5% - Low competition", 5),
+    ("12.5%", 12.5),
+    ("10", 10),
+    ("120%", NAN),
+    ("High", NAN),
+    ("-", NAN),
+])
+def test_competition(text, pct):
+    assert same(parse_competition(pd.Series([text], dtype="string")).iloc[0], pct)
+
+
+@pytest.mark.parametrize("difficulty, search_volume, competition_level, volume_out, competition_out", [
+    ("Low", "100-200", "20%", False, False),
+    ("Low", "300-500", "30-40%", False, True),
+    ("Low", "1,000+", "45%", True, True),
+    ("Medium", "500 to 1000", "45%", False, False),
+    ("Medium", "1-5k", "10", False, True),
+    ("Medium", "5", "70%", True, True),
+    ("High", "1,000+", "80 to 90%", False, False),
+    ("High", "300-500", "30-40%", True, True),
+    ("High", "unknown", "unknown", False, False),
+])
+def test_out_of_range_flags(difficulty, search_volume, competition_level, volume_out, competition_out):
+    df = pd.DataFrame({"search_volume": [search_volume], "competition_level": [competition_level]})
+    row = add_metric_columns(df, difficulty).iloc[0]
+    assert (row["volume_out_of_range"], row["competition_out_of_range"]) == (volume_out, competition_out)
+
+
+def test_priority_favours_volume_and_low_competition():
+    df = pd.DataFrame({
+        "search_volume": ["1-5k", "1-5k", "100", "100000+", "n/a"],
+        "competition_level": ["10%", "80%", "10%", "0%", "10%"],
+    })
+    scores = add_metric_columns(df, "Low")["priority_score"]
+    assert scores[0] > scores[1] and scores[0] > scores[2]
+    assert scores[3] == 100
+    assert pd.isna(scores[4])
+
+
+def test_each_rows_own_difficulty_is_used_without_one_given():
+    df = pd.DataFrame({
+        "search_volume": ["1,000+", "1,000+", "1,000+"],
+        "competition_level": ["70%", "70%", "70%"],
+        "difficulty_level": ["Low", "High", "Unknown"],
+    })
+    scored = add_metric_columns(df)
+    assert scored["volume_out_of_range"].tolist() == [True, False, False]
+    assert scored["competition_out_of_range"].tolist() == [True, False, False]
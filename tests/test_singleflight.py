@@ -0,0 +1,127 @@
+import threading
+import time
+
+from clusterapp import singleflight
+from clusterapp.exceptions import SharedRequestError
+from clusterapp.generator import coalesced_keyword_set, generation_flights
+from clusterapp.singleflight import SingleFlight
+
+
+class Stopped(BaseException):
+    pass
+
+
+# Run calls in threads, collecting each one's return value or exception by index
+def run_in_threads(calls):
+    outcomes = [None] * len(calls)
+
+    def run(index, call):
+        try:
+            outcomes[index] = call()
+        except BaseException as e:
+            outcomes[index] = e
+
+    threads = [threading.Thread(target=run, args=(i, call)) for i, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+def wait_for_waiters(flights, key, count):
+    deadline = time.monotonic() + 5
+    while flights._calls[key].waiters < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_waiters_share_the_leaders_result():
+    flights = SingleFlight()
+    release = threading.Event()
+    executions = []
+
+    def work():
+        executions.append(1)
+        release.wait(5)
+        return "result"
+
+    threads, outcomes = run_in_threads([lambda: flights.do("key", work) for _ in range(4)])
+    wait_for_waiters(flights, "key", 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert sorted(outcomes, key=lambda outcome: outcome[1]) == [("result", False)] + [("result", True)] * 3
+    assert len(executions) == 1
+    assert flights.stats() == {"in_flight": 0, "executions": 1, "coalesced": 3}
+
+
+def test_waiters_get_their_own_shared_error_caused_by_the_leaders():
+    flights = SingleFlight()
+    release = threading.Event()
+    error = ValueError("provider down")
+
+    def work():
+        release.wait(5)
+        raise error
+
+    threads, outcomes = run_in_threads([lambda: flights.do("key", work) for _ in range(3)])
+    wait_for_waiters(flights, "key", 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert sum(outcome is error for outcome in outcomes) == 1
+    shared = [outcome for outcome in outcomes if isinstance(outcome, SharedRequestError)]
+    assert len(shared) == 2 and shared[0] is not shared[1]
+    assert all(outcome.__cause__ is error and str(outcome) == "provider down" for outcome in shared)
+    # A failure is not remembered; the next call runs again
+    assert flights.do("key", lambda: "retried") == ("retried", False)
+
+
+def test_a_waiter_takes_over_when_the_leader_is_stopped():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def stopped():
+        release.wait(5)
+        raise Stopped()
+
+    threads, outcomes = run_in_threads([lambda: flights.do("key", stopped)])
+    deadline = time.monotonic() + 5
+    while "key" not in flights._calls:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+    waiter_threads, waiter_outcomes = run_in_threads([lambda: flights.do("key", lambda: "taken over")])
+    wait_for_waiters(flights, "key", 1)
+    release.set()
+    for thread in threads + waiter_threads:
+        thread.join()
+    assert isinstance(outcomes[0], Stopped)
+    assert waiter_outcomes == [("taken over", False)]
+    assert flights.stats() == {"in_flight": 0, "executions": 2, "coalesced": 0}
+
+
+def test_waiters_wait_for_as_long_as_the_leader_runs(monkeypatch):
+    monkeypatch.setattr(singleflight, "LEADER_CHECK_SECONDS", 0.01)
+    flights = SingleFlight()
+
+    def slow():
+        time.sleep(0.2)
+        return "slow result"
+
+    threads, outcomes = run_in_threads([lambda: flights.do("key", slow) for _ in range(2)])
+    for thread in threads:
+        thread.join()
+    assert sorted(outcomes, key=lambda outcome: outcome[1]) == [("slow result", False), ("slow result", True)]
+
+
+def test_waiters_get_their_own_copy_of_the_keywords(fake_llm):
+    fake, settings = fake_llm(latency=0.3)
+    generate = lambda: coalesced_keyword_set("organic gardening", "Low", None, None, None, settings)
+    threads, outcomes = run_in_threads([generate, generate])
+    for thread in threads:
+        thread.join()
+    assert fake.calls == 1
+    first, second = outcomes
+    assert first is not second and first.equals(second)
+    second.loc[0, "keyword"] = "changed"
+    assert first.loc[0, "keyword"] != "changed"
+    assert generation_flights.in_flight() == 0
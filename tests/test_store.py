@@ -0,0 +1,109 @@
+import pandas as pd
+
+from clusterapp.llm import LLMSettings
+from clusterapp.store import ResultStore, compact_frame
+
+
+def keywords(count, prefix="keyword"):
+    return pd.DataFrame({"keyword": [f"{prefix} {i}" for i in range(count)], "search_volume": ["100"] * count})
+
+
+def entry_size(df):
+    return int(compact_frame(df).memory_usage(deep=True).sum())
+
+
+def topics(store, session_id):
+    return list(store.session_results(session_id))
+
+
+def test_session_cap_evicts_the_sessions_least_recently_used_result():
+    size = entry_size(keywords(10))
+    store = ResultStore(max_bytes=100 * size, max_session_bytes=int(2.5 * size))
+    store.put("a", "first", "Low", keywords(10))
+    store.put("a", "second", "Low", keywords(10))
+    store.put("b", "other", "Low", keywords(10))
+    # Reading "first" makes "second" the least recently used result of session a
+    assert store.get("a", "first", "Low") is not None
+    store.put("a", "third", "Low", keywords(10))
+    assert topics(store, "a") == ["first", "third"]
+    assert topics(store, "b") == ["other"]
+    assert store.stats()["evictions"] == 1
+
+
+def test_global_cap_evicts_the_least_recently_used_result_of_any_session():
+    size = entry_size(keywords(10))
+    store = ResultStore(max_bytes=int(3.5 * size), max_session_bytes=100 * size)
+    store.put("a", "first", "Low", keywords(10))
+    store.put("b", "second", "Low", keywords(10))
+    store.put("a", "third", "Low", keywords(10))
+    assert store.find("first", "Low") is not None
+    store.put("c", "fourth", "Low", keywords(10))
+    assert topics(store, "a") == ["third", "first"]
+    assert not store.has_results("b")
+    assert store.stats()["total_bytes"] == 3 * size
+
+
+def test_the_newest_result_is_kept_even_when_over_the_cap():
+    store = ResultStore(max_bytes=1, max_session_bytes=1)
+    store.put("a", "first", "Low", keywords(10))
+    store.put("a", "second", "Low", keywords(10))
+    assert topics(store, "a") == ["second"]
+    assert store.stats()["entries"] == 1
+
+
+def test_replacing_a_result_does_not_count_it_twice():
+    store = ResultStore()
+    store.put("a", "first", "Low", keywords(10))
+    store.put("a", "First", "Low", keywords(5))
+    assert store.stats()["total_bytes"] == entry_size(keywords(5))
+    assert len(store.get("a", "first", "Low")) == 5
+
+
+def test_combined_frames_are_dropped_when_their_session_changes():
+    size = entry_size(keywords(10))
+    store = ResultStore(max_bytes=int(2.5 * size))
+    store.put("a", "first", "Low", keywords(10))
+    frame = store.session_frame("a")
+    assert store.session_frame("a") is frame
+    assert len(frame) == 10
+
+    # Evicting session a's only result through another session's puts drops its frame too
+    store.put("b", "second", "Low", keywords(10))
+    store.put("b", "third", "Low", keywords(10))
+    assert not store.has_results("a")
+    assert store._frames == {}
+    assert store.session_frame("a").empty
+
+    frame = store.session_frame("b")
+    store.put("b", "fourth", "Low", keywords(3))
+    assert "b" not in store._frames
+    assert store.session_frame("b")["topic"].tolist().count("fourth") == 3
+
+
+def test_clear_session_only_clears_that_session():
+    store = ResultStore()
+    store.put("a", "first", "Low", keywords(10))
+    store.put("b", "first", "High", keywords(10))
+    store.session_frame("a")
+    store.clear_session("a")
+    assert not store.has_results("a")
+    assert store._frames == {}
+    assert store.find("first", "High") is not None
+    assert store.stats()["total_bytes"] == entry_size(keywords(10))
+
+
+def test_results_are_only_found_for_the_settings_that_generated_them():
+    gpt35 = LLMSettings(model="gpt-3.5-turbo").generation_key
+    gpt4o = LLMSettings(model="gpt-4o").generation_key
+    store = ResultStore()
+    store.put("a", "organic gardening", "Low", keywords(3, "old"), generated_by=gpt35)
+    assert store.find("Organic Gardening", "Low", generated_by=gpt4o) is None
+    assert store.find("Organic Gardening", "Low", generated_by=gpt35)["keyword"].tolist()[0] == "old 0"
+
+    store.put("b", "organic gardening", "Low", keywords(3, "new"), generated_by=gpt4o)
+    assert store.find("organic gardening", "Low", generated_by=gpt4o)["keyword"].tolist()[0] == "new 0"
+    assert store.find("organic gardening", "Low", generated_by=gpt35)["keyword"].tolist()[0] == "old 0"
+    # Temperature and JSON mode change the output too; hedging and connection settings do not
+    assert LLMSettings(temperature=1.2).generation_key != LLMSettings().generation_key
+    assert LLMSettings(json_mode=not LLMSettings().json_mode).generation_key != LLMSettings().generation_key
+    assert LLMSettings(hedge=True, max_connections=3).generation_key == LLMSettings().generation_key
@@ -0,0 +1,40 @@
+import pandas as pd
+
+from clusterapp.cache import KeywordCache
+from clusterapp.store import ResultStore
+from clusterapp.topics import normalize_topic
+
+
+def test_symbols_keep_topics_apart():
+    topics = ["C++ tutorials", "C# tutorials", "C tutorials", "F# tutorials"]
+    assert len({normalize_topic(topic) for topic in topics}) == len(topics)
+
+
+def test_separators_and_plurals_fold():
+    assert normalize_topic("organic-gardening") == normalize_topic("Organic Gardening")
+    assert normalize_topic("organic_gardening") == normalize_topic("organic/gardening")
+    assert normalize_topic("Organic Gardens?") == normalize_topic("organic garden")
+    assert normalize_topic("Food & Drink") == normalize_topic("food and drink")
+
+
+def test_cache_keys_differ_for_symbol_variants():
+    key = lambda topic: KeywordCache.make_key(topic, "Low", "model", "system", "user")
+    assert key("C++ tutorials") != key("C# tutorials")
+    assert key("C++ Tutorials") == key("c++ tutorial")
+
+
+def test_store_does_not_reuse_a_symbol_variant():
+    store = ResultStore()
+    store.put("session", "C++ tutorials", "Low", pd.DataFrame({"keyword": ["c++ pointers"]}))
+    assert store.find("C# tutorials", "Low") is None
+    assert store.find("c++ tutorial", "Low")["keyword"].tolist() == ["c++ pointers"]
+
+
+def test_display_names_are_never_canonical():
+    # The naive singularizer turns these into "buse" and "heroe"; only keys may contain that
+    store = ResultStore()
+    store.put("session", "School Buses", "Low", pd.DataFrame({"keyword": ["Superheroes"]}))
+    assert store.index.topic_name("school buses") == "School Buses"
+    assert list(store.session_results("session")) == ["School Buses"]
+    match = store.index.search("superhero")[0]
+    assert (match["text"], match["topic"]) == ("Superheroes", "School Buses")
@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+from clusterapp.config import DRILLDOWN_KEYWORD_COUNT
+from clusterapp.exceptions import ClusterGenerationError
+from clusterapp.tree import TopicTree
+
+ROOT = pd.DataFrame({"keyword": ["compost bins", "raised beds"]})
+
+
+def test_expands_to_the_maximum_depth_and_no_further(fake_llm):
+    fake, settings = fake_llm()
+    tree = TopicTree(max_depth=3)
+    path = ("organic gardening", "compost bins")
+    for level in (2, 3):
+        assert tree.can_expand(path)
+        children = tree.expand(path, "Low", llm_settings=settings)
+        assert 0 < len(children) <= DRILLDOWN_KEYWORD_COUNT
+        assert tree.to_frame("organic gardening", "Low", ROOT)["level"].max() == level
+        path = (*path, children["keyword"].iloc[0])
+
+    assert not tree.can_expand(path)
+    with pytest.raises(ClusterGenerationError, match="3 levels below the topic"):
+        tree.expand(path, "Low", llm_settings=settings)
+    assert fake.calls == 2
+    assert tree.stats() == {"nodes": 2, "expansions": 2}
+
+
+def test_expanded_nodes_are_reused(fake_llm):
+    fake, settings = fake_llm()
+    tree = TopicTree()
+    first = tree.expand(("organic gardening", "Compost Bins"), "Low", llm_settings=settings)
+    again = tree.expand(("Organic Gardening", "compost bin"), "Low", llm_settings=settings)
+    assert first.equals(again)
+    assert fake.calls == 1
+    assert "priority_score" in first.columns
+
+
+def test_nested_export_follows_expanded_keywords(fake_llm):
+    fake, settings = fake_llm()
+    tree = TopicTree()
+    children = tree.expand(("organic gardening", "raised beds"), "Low", llm_settings=settings)
+    nested = tree.to_nested("organic gardening", "Low", ROOT)
+    compost, raised = nested["keywords"]
+    assert "children" not in compost
+    assert [child["keyword"] for child in raised["children"]] == children["keyword"].tolist()